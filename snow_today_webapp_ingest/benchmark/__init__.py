@@ -0,0 +1,29 @@
+"""Benchmarks for choosing between ways of producing outputs.
+
+Run with the `benchmark` CLI command group.
+"""
+
+import dataclasses
+from typing import Any
+
+
+def format_table(results: list[Any]) -> str:
+    """Format a list of dataclass instances as an aligned plain-text table."""
+    if not results:
+        return "(no results)"
+
+    rows = [
+        [_format_value(v) for v in dataclasses.astuple(result)] for result in results
+    ]
+    header = [field.name for field in dataclasses.fields(results[0])]
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths, strict=True))
+        for row in [header, *rows]
+    )
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
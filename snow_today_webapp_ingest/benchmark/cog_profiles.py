@@ -0,0 +1,91 @@
+"""Compare COG profiles by output size, encode time, and tile decode time."""
+
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from loguru import logger
+
+from snow_today_webapp_ingest.constants.cog_profiles import COG_PROFILES
+from snow_today_webapp_ingest.types_.cog_profile_name import CogProfileName
+from snow_today_webapp_ingest.util.gdal import init_gdal_worker, translate
+
+
+@dataclass(frozen=True)
+class CogProfileResult:
+    profile: CogProfileName
+    output_bytes: int
+    encode_seconds: float
+    tiles: int
+    # Mean time to read and decompress one full-resolution tile
+    tile_decode_ms: float
+
+
+def benchmark_cog_profiles(
+    sample_tif_path: Path,
+    *,
+    profile_names: list[CogProfileName],
+    repeat: int,
+) -> list[CogProfileResult]:
+    """Encode `sample_tif_path` with each profile. Report the best of `repeat` runs."""
+    init_gdal_worker({})
+
+    results: list[CogProfileResult] = []
+    with TemporaryDirectory() as tmpdir:
+        for profile_name in profile_names:
+            logger.info(f"Benchmarking COG profile {profile_name}...")
+            output_path = Path(tmpdir) / f"{profile_name}.tif"
+
+            encode_seconds = min(
+                _time(
+                    translate,
+                    sample_tif_path,
+                    output_path,
+                    output_format="COG",
+                    creation_options=COG_PROFILES[profile_name].creation_options,
+                )
+                for _ in range(repeat)
+            )
+            decode_seconds, tiles = min(
+                _time_tile_decode(output_path) for _ in range(repeat)
+            )
+
+            results.append(
+                CogProfileResult(
+                    profile=profile_name,
+                    output_bytes=output_path.stat().st_size,
+                    encode_seconds=encode_seconds,
+                    tiles=tiles,
+                    tile_decode_ms=1000 * decode_seconds / tiles,
+                )
+            )
+
+    return results
+
+
+def _time(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def _time_tile_decode(cog_path: Path) -> tuple[float, int]:
+    """Read every full-resolution tile of the first band, like a zoomed-in client.
+
+    Returns the total time and the number of tiles read.
+    """
+    from osgeo import gdal
+
+    # `ReadBlock` bypasses GDAL's block cache, so every tile is decoded
+    dataset = gdal.Open(str(cog_path))
+    band = dataset.GetRasterBand(1)
+    block_x_size, block_y_size = band.GetBlockSize()
+    blocks_x = -(-band.XSize // block_x_size)
+    blocks_y = -(-band.YSize // block_y_size)
+
+    start = time.perf_counter()
+    for block_y in range(blocks_y):
+        for block_x in range(blocks_x):
+            band.ReadBlock(block_x, block_y)
+    return time.perf_counter() - start, blocks_x * blocks_y
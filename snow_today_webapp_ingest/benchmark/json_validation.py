@@ -0,0 +1,95 @@
+"""Compare JSON validators by throughput on a data class's input files."""
+
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from jsonschema import validate
+from loguru import logger
+
+from snow_today_webapp_ingest.constants.data_classes import OutputDataClassName
+from snow_today_webapp_ingest.data_classes import OUTPUT_DATA_CLASSES
+from snow_today_webapp_ingest.ingest.validate_and_copy_json import (
+    JsonModel,
+    JsonValidator,
+    json_schema,
+    json_validator,
+    matching_files,
+)
+
+
+@dataclass(frozen=True)
+class JsonValidationResult:
+    validator: str
+    files: int
+    megabytes: float
+    seconds: float
+    files_per_second: float
+
+
+def benchmark_json_validation(
+    data_class_name: OutputDataClassName,
+    *,
+    repeat: int,
+) -> list[JsonValidationResult]:
+    """Validate a data class's input files with each validator.
+
+    Files are read into memory first, so only parsing and validation are timed. Report
+    the best of `repeat` runs.
+    """
+    model, input_files = _model_and_input_files(data_class_name)
+    documents = [path.read_bytes() for path in input_files]
+    megabytes = sum(len(document) for document in documents) / 1024**2
+    logger.info(f"Validating {len(documents)} files ({megabytes:.1f}MB)...")
+
+    validators: dict[str, JsonValidator] = {
+        # What ingest did before the validator registry: jsonschema checks the schema
+        # and builds a validator for every file.
+        "jsonschema": lambda data: validate(
+            schema=json_schema(model),
+            instance=json.loads(data),
+        ),
+        "registry": json_validator(model),
+    }
+
+    results: list[JsonValidationResult] = []
+    for name, validator in validators.items():
+        logger.info(f"Benchmarking {name} validator...")
+        seconds = min(_time_validation(validator, documents) for _ in range(repeat))
+        results.append(
+            JsonValidationResult(
+                validator=name,
+                files=len(documents),
+                megabytes=megabytes,
+                seconds=seconds,
+                files_per_second=len(documents) / seconds,
+            )
+        )
+
+    return results
+
+
+def _model_and_input_files(
+    data_class_name: OutputDataClassName,
+) -> tuple[JsonModel, list[Path]]:
+    ingest_task = OUTPUT_DATA_CLASSES[data_class_name].ingest_task
+    model = ingest_task.ingest_func.kwargs.get("model")
+    if model is None or not isinstance(ingest_task.from_path, Path):
+        raise RuntimeError(f"{data_class_name} isn't validated against a model")
+
+    pattern = ingest_task.ingest_func.kwargs.get("pattern")
+    if pattern is None:
+        return model, [ingest_task.from_path]
+
+    input_files = matching_files(ingest_task.from_path, pattern)
+    if not input_files:
+        raise RuntimeError(f"No {data_class_name} files in {ingest_task.from_path}")
+    return model, input_files
+
+
+def _time_validation(validator: JsonValidator, documents: list[bytes]) -> float:
+    start = time.perf_counter()
+    for document in documents:
+        validator(document)
+    return time.perf_counter() - start
@@ -0,0 +1,84 @@
+"""Compare plot JSON with the binary plot encoding by size and decode time."""
+
+import gzip
+import json
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from snow_today_webapp_ingest.data_classes import OUTPUT_DATA_CLASSES
+from snow_today_webapp_ingest.ingest.validate_and_copy_json import matching_files
+from snow_today_webapp_ingest.types_.plot import PlotPayload
+from snow_today_webapp_ingest.util.plot_binary import decode_plot, encode_plot
+
+
+@dataclass(frozen=True)
+class PlotEncodingResult:
+    encoding: str
+    files: int
+    megabytes: float
+    # As served with the `.gz` siblings written at publish
+    gzip_megabytes: float
+    decode_seconds: float
+    files_per_second: float
+
+
+def benchmark_plot_encoding(*, repeat: int) -> list[PlotEncodingResult]:
+    """Encode the incoming plot files both ways, and time decoding each.
+
+    Decode time in Python stands in for the browser's: `json.loads` for `JSON.parse`,
+    and NumPy views for typed array views. Report the best of `repeat` runs.
+    """
+    ingest_task = OUTPUT_DATA_CLASSES["plotsJson"].ingest_task
+    if not isinstance(ingest_task.from_path, Path):
+        raise RuntimeError("Programmer error: plots are ingested from one directory")
+
+    input_files = matching_files(
+        ingest_task.from_path,
+        ingest_task.ingest_func.kwargs["pattern"],
+    )
+    if not input_files:
+        raise RuntimeError(f"No plot files in {ingest_task.from_path}")
+
+    json_documents = [path.read_bytes() for path in input_files]
+    logger.info(f"Encoding {len(json_documents)} plots...")
+    encoded: dict[str, tuple[list[bytes], Callable[[bytes], object]]] = {
+        "json": (json_documents, json.loads),
+        "binary": (
+            [
+                encode_plot(PlotPayload.model_validate_json(document))
+                for document in json_documents
+            ],
+            decode_plot,
+        ),
+    }
+
+    results: list[PlotEncodingResult] = []
+    for encoding, (documents, decode) in encoded.items():
+        logger.info(f"Benchmarking {encoding} decoding...")
+        seconds = min(_time_decoding(decode, documents) for _ in range(repeat))
+        results.append(
+            PlotEncodingResult(
+                encoding=encoding,
+                files=len(documents),
+                megabytes=sum(len(d) for d in documents) / 1024**2,
+                gzip_megabytes=sum(
+                    len(gzip.compress(d, compresslevel=9, mtime=0)) for d in documents
+                )
+                / 1024**2,
+                decode_seconds=seconds,
+                files_per_second=len(documents) / seconds,
+            )
+        )
+
+    return results
+
+
+def _time_decoding(decode: Callable[[bytes], object], documents: list[bytes]) -> float:
+    start = time.perf_counter()
+    for document in documents:
+        decode(document)
+    return time.perf_counter() - start
@@ -1,12 +1,15 @@
 """CLI invoked by operations team.
 
 NOTE: imports are done in functions to avoid needing to evaluate code within those
-imports when doing `--help`.
+imports when doing `--help`. Keep it that way: `inv test.startup` fails if importing
+this module takes too long or imports heavy libraries.
 """
 
+from datetime import date
+from functools import partial
 from pathlib import Path
-from shutil import rmtree
 from tempfile import mkdtemp
+from typing import get_args
 
 import click
 from click_loglevel import LogLevel
@@ -14,16 +17,20 @@ from loguru import logger
 
 # NOTE: These aren't local imports because they're needed for a click decorator or
 # shared between functions.
-from snow_today_webapp_ingest.constants.date import TODAY
-from snow_today_webapp_ingest.data_classes import (
+from snow_today_webapp_ingest.cog_cache import COG_CACHE_MAX_BYTES
+from snow_today_webapp_ingest.constants.data_classes import (
     COMMON_OUTPUT_DATA_CLASS_NAMES,
-    COMMON_OUTPUT_DATA_CLASSES,
+    OUTPUT_DATA_CLASS_NAMES,
     SSP_OUTPUT_DATA_CLASS_NAMES,
-    SSP_OUTPUT_DATA_CLASSES,
     SWE_OUTPUT_DATA_CLASS_NAMES,
-    SWE_OUTPUT_DATA_CLASSES,
-    OutputDataClass,
+    OutputDataClassName,
 )
+from snow_today_webapp_ingest.settings import (
+    CogValidationMode,
+    IngestSettings,
+    JsonPublishMode,
+)
+from snow_today_webapp_ingest.types_.cog_profile_name import CogProfileName
 from snow_today_webapp_ingest.types_.data_sources import DataSource
 
 common_tasks_arg = click.argument(
@@ -97,8 +104,6 @@ def cli(log_level: int) -> None:
 #     validate_against_schema(Path(file))
 #     logger.success("JSON is valid!")
 
-# TODO: Add command to validate an output directory.
-
 
 @cli.group()
 @click.option(
@@ -114,12 +119,109 @@ def cli(log_level: int) -> None:
     is_flag=True,
     help=(
         "On success, copy pre-existing data to a backup directory."
-        " If not set, pre-existing data will be replaced with results of ingest.."
+        " If not set, pre-existing data will be deleted once it has not been live for"
+        " a grace period."
+    ),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=4,
+    help="Maximum number of ingest tasks to run concurrently.",
+    show_default=True,
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help=(
+        "Skip tasks whose inputs are unchanged since the live data was ingested, and"
+        " reuse the live outputs instead."
+    ),
+)
+@click.option(
+    "--include-optional",
+    is_flag=True,
+    help=(
+        "Also run optional tasks, e.g. rasterTiles."
+        " Optional tasks passed as TASKS are always run."
+    ),
+)
+@click.option(
+    "--cog-web-mercator",
+    is_flag=True,
+    help=(
+        "Reproject COGs to Web Mercator (EPSG:3857), with tiles and overviews aligned"
+        " to web map zoom levels, so clients don't have to reproject them."
+    ),
+)
+@click.option(
+    "--cog-validation",
+    type=click.Choice(("header", "full")),
+    default="header",
+    help=(
+        "How thoroughly to check the layout of COGs before they go live."
+        " 'full' also checks every block, which reads the whole file."
+    ),
+    show_default=True,
+)
+@click.option(
+    "--json-publish-mode",
+    type=click.Choice(get_args(JsonPublishMode)),
+    default="copy",
+    help=(
+        "How to write JSON files once validated. 'copy' and 'hardlink' publish the"
+        " input bytes unchanged; hardlinked outputs change if an input is later"
+        " modified in place. 'minify' strips whitespace."
+    ),
+    show_default=True,
+)
+@click.option(
+    "--validate-workers",
+    type=click.IntRange(min=1),
+    help=(
+        "Number of processes validating JSON files which match a pattern, e.g. plots."
+        " Each validates at least 500 files, so fewer run if there are fewer files."
+        " Default: one per available CPU."
+    ),
+)
+@click.option(
+    "--strict-references",
+    is_flag=True,
+    help=(
+        "Fail, instead of warning, if outputs reference files or IDs which don't"
+        " exist, e.g. a super-region's COG. Checked after a full ingest."
+    ),
+)
+@click.option(
+    "--brotli",
+    is_flag=True,
+    help=(
+        "Also write a Brotli-compressed `.br` sibling of each text output, as well as"
+        " `.gz`. Requires the `brotli` package."
     ),
 )
 @click.pass_context
-def ingest(ctx, dry_run: bool, keep_backup: bool) -> None:
+def ingest(
+    ctx,
+    dry_run: bool,
+    keep_backup: bool,
+    jobs: int,
+    incremental: bool,
+    include_optional: bool,
+    cog_web_mercator: bool,
+    cog_validation: CogValidationMode,
+    json_publish_mode: JsonPublishMode,
+    validate_workers: int | None,
+    strict_references: bool,
+    brotli: bool,
+) -> None:
     """Ingest data payload to update the webapp."""
+    from snow_today_webapp_ingest.precompress import brotli_available
+
+    if brotli and not brotli_available():
+        raise click.UsageError("--brotli requires the `brotli` package.")
+
     if dry_run:
         logger.warning("Starting dry-run; output will remain in WIP directory!")
 
@@ -127,6 +229,17 @@ def ingest(ctx, dry_run: bool, keep_backup: bool) -> None:
     ctx.ensure_object(dict)
     ctx.obj['dry_run'] = dry_run
     ctx.obj['keep_backup'] = keep_backup
+    ctx.obj['jobs'] = jobs
+    ctx.obj['incremental'] = incremental
+    ctx.obj['include_optional'] = include_optional
+    ctx.obj['settings'] = IngestSettings(
+        cog_validation=cog_validation,
+        cog_web_mercator=cog_web_mercator,
+        json_publish_mode=json_publish_mode,
+        validate_workers=validate_workers,
+        strict_references=strict_references,
+        precompress_brotli=brotli,
+    )
 
 
 @ingest.command()
@@ -140,6 +253,10 @@ def common(ctx, *, common_tasks: tuple[str, ...]) -> None:
     _ingest(
         dry_run=ctx.obj["dry_run"],
         keep_backup=ctx.obj["keep_backup"],
+        jobs=ctx.obj["jobs"],
+        incremental=ctx.obj["incremental"],
+        include_optional=ctx.obj["include_optional"],
+        settings=ctx.obj["settings"],
         source="common",
         tasks_include=common_tasks,
     )
@@ -156,6 +273,10 @@ def snow_surface_properties(ctx, *, ssp_tasks: tuple[str, ...]) -> None:
     _ingest(
         dry_run=ctx.obj["dry_run"],
         keep_backup=ctx.obj["keep_backup"],
+        jobs=ctx.obj["jobs"],
+        incremental=ctx.obj["incremental"],
+        include_optional=ctx.obj["include_optional"],
+        settings=ctx.obj["settings"],
         source="snow-surface-properties",
         tasks_include=ssp_tasks,
     )
@@ -172,25 +293,249 @@ def snow_water_equivalent(ctx, *, swe_tasks: tuple[str, ...]) -> None:
     _ingest(
         dry_run=ctx.obj["dry_run"],
         keep_backup=ctx.obj["keep_backup"],
+        jobs=ctx.obj["jobs"],
+        incremental=ctx.obj["incremental"],
+        include_optional=ctx.obj["include_optional"],
+        settings=ctx.obj["settings"],
         source="snow-water-equivalent",
         tasks_include=swe_tasks,
     )
 
 
-def _ingest(  # noqa: C901
+@ingest.command()
+@click.argument(
+    "source",
+    type=click.Choice(("snow-surface-properties", "snow-water-equivalent")),
+)
+@click.option(
+    "--dir",
+    "output_dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Output directory to check. Default: the live data for SOURCE.",
+)
+def validate_output(source: DataSource, output_dir: Path | None) -> None:
+    """Check that SOURCE's outputs only reference files and IDs which exist.
+
+    Fail if any reference is dangling, e.g. a super-region's COG is missing.
+    """
+    from snow_today_webapp_ingest.constants.paths import OUTPUT_LIVE_DIR
+    from snow_today_webapp_ingest.references import check_references
+    from snow_today_webapp_ingest.util.error import DanglingReferenceError
+
+    try:
+        check_references(output_dir or OUTPUT_LIVE_DIR / source, strict=True)
+    except DanglingReferenceError as e:
+        raise click.ClickException(str(e)) from e
+
+
+@ingest.command()
+@click.option(
+    "--source",
+    "sources",
+    type=click.Choice(("snow-surface-properties", "snow-water-equivalent")),
+    multiple=True,
+    help="Data source to watch. Can be passed multiple times. Default: all.",
+)
+@click.option(
+    "--poll-interval",
+    type=click.FloatRange(min=1),
+    default=60,
+    help="Seconds between checks for TRIGGER files, if no change is detected sooner.",
+    show_default=True,
+)
+@click.option(
+    "--debounce",
+    type=click.FloatRange(min=0),
+    default=10,
+    help="Seconds without changes to incoming data to wait before ingesting.",
+    show_default=True,
+)
+@click.pass_context
+def watch(
+    ctx,
+    *,
+    sources: tuple[DataSource, ...],
+    poll_interval: float,
+    debounce: float,
+) -> None:
+    """Ingest each data source when its incoming TRIGGER file appears.
+
+    Runs until interrupted. Ingest start-up is done once, ahead of time, so ingest
+    begins as soon as new data is complete.
+    """
+    from snow_today_webapp_ingest.watch import (
+        WATCHED_INCOMING_DIRS,
+        warm_up,
+        watch_triggers,
+    )
+
+    def _on_trigger(source: DataSource) -> None:
+        _ingest(
+            dry_run=ctx.obj["dry_run"],
+            keep_backup=ctx.obj["keep_backup"],
+            jobs=ctx.obj["jobs"],
+            incremental=ctx.obj["incremental"],
+            include_optional=ctx.obj["include_optional"],
+            settings=ctx.obj["settings"],
+            source=source,
+            tasks_include=(),
+        )
+
+    warm_up()
+    watch_triggers(
+        sources or WATCHED_INCOMING_DIRS.keys(),
+        on_trigger=_on_trigger,
+        poll_interval=poll_interval,
+        debounce=debounce,
+    )
+
+
+@cli.group()
+def cache() -> None:
+    """Manage data cached between ingests."""
+
+
+@cache.command()
+@click.option(
+    "--max-size-gb",
+    type=click.FloatRange(min=0),
+    default=COG_CACHE_MAX_BYTES / 1024**3,
+    help="Evict least recently used COGs until the COG cache is at most this size.",
+    show_default=True,
+)
+def prune(*, max_size_gb: float) -> None:
+    """Evict COGs from the COG cache.
+
+    This is also done automatically after every ingest, with the default size.
+    """
+    from snow_today_webapp_ingest.cog_cache import prune_cog_cache
+
+    freed_bytes = prune_cog_cache(max_bytes=int(max_size_gb * 1024**3))
+    logger.success(f"🧹 Freed {freed_bytes / 1024**2:.1f}MB from the COG cache.")
+
+
+@cli.group()
+def benchmark() -> None:
+    """Compare ways of producing outputs."""
+
+
+@benchmark.command()
+@click.argument(
+    "sample_tif",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--profile",
+    "profile_names",
+    type=click.Choice(get_args(CogProfileName)),
+    multiple=True,
+    help="COG profile to benchmark. Can be passed multiple times. Default: all.",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="Report the fastest of this many runs.",
+    show_default=True,
+)
+def cog_profiles(
+    *,
+    sample_tif: Path,
+    profile_names: tuple[CogProfileName, ...],
+    repeat: int,
+) -> None:
+    """Encode SAMPLE_TIF with each COG profile; compare size and speed."""
+    from snow_today_webapp_ingest.benchmark import format_table
+    from snow_today_webapp_ingest.benchmark.cog_profiles import benchmark_cog_profiles
+
+    results = benchmark_cog_profiles(
+        sample_tif,
+        profile_names=list(profile_names or get_args(CogProfileName)),
+        repeat=repeat,
+    )
+    print(format_table(results))
+
+
+@benchmark.command()
+@click.argument(
+    "data_class",
+    type=click.Choice(OUTPUT_DATA_CLASS_NAMES),
+    default="plotsJson",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="Report the fastest of this many runs.",
+    show_default=True,
+)
+def json_validation(*, data_class: OutputDataClassName, repeat: int) -> None:
+    """Validate DATA_CLASS's incoming files with each validator; compare throughput.
+
+    DATA_CLASS defaults to plotsJson.
+    """
+    from snow_today_webapp_ingest.benchmark import format_table
+    from snow_today_webapp_ingest.benchmark.json_validation import (
+        benchmark_json_validation,
+    )
+
+    results = benchmark_json_validation(data_class, repeat=repeat)
+    print(format_table(results))
+
+
+@benchmark.command()
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="Report the fastest of this many runs.",
+    show_default=True,
+)
+def plot_encoding(*, repeat: int) -> None:
+    """Encode incoming plots as JSON and as binary; compare size and decode time."""
+    from snow_today_webapp_ingest.benchmark import format_table
+    from snow_today_webapp_ingest.benchmark.plot_encoding import (
+        benchmark_plot_encoding,
+    )
+
+    results = benchmark_plot_encoding(repeat=repeat)
+    print(format_table(results))
+
+
+def _ingest(
     *,
     dry_run: bool,
     keep_backup: bool,
+    jobs: int,
+    incremental: bool,
+    include_optional: bool,
+    settings: IngestSettings,
     source: DataSource,
     tasks_include: tuple[str, ...],
 ) -> None:
     from snow_today_webapp_ingest.constants.paths import (
         INGEST_WIP_DIR,
-        OUTPUT_BKP_DIR,
         OUTPUT_LIVE_COMMON_DIR,
         OUTPUT_LIVE_SSP_DIR,
         OUTPUT_LIVE_SWE_DIR,
     )
+    from snow_today_webapp_ingest.data_classes import (
+        COMMON_OUTPUT_DATA_CLASSES,
+        SSP_OUTPUT_DATA_CLASSES,
+        SWE_OUTPUT_DATA_CLASSES,
+        OutputDataClass,
+    )
+    from snow_today_webapp_ingest.incremental import (
+        ingest_with_manifest,
+        read_manifest,
+        write_manifest,
+    )
+    from snow_today_webapp_ingest.precompress import precompress_outputs
+    from snow_today_webapp_ingest.publish import publish
+    from snow_today_webapp_ingest.references import check_references
+    from snow_today_webapp_ingest.report import RunReporter
+    from snow_today_webapp_ingest.scheduler import run_ingest_tasks
+    from snow_today_webapp_ingest.settings import configure_ingest
 
     # TODO: This should be a mapping:
     if source == "snow-surface-properties":
@@ -206,23 +551,62 @@ def _ingest(  # noqa: C901
         # TODO: Can we get exhaustiveness checking from mypy?
         raise RuntimeError("Programmer error.")
 
-    tasks_to_run: list[OutputDataClass]
+    tasks_to_run: dict[OutputDataClassName, OutputDataClass]
     if not tasks_include:
         # Run all the tasks
-        tasks_to_run = list(data_class_set.values())
+        tasks_to_run = {
+            dc_name: dc
+            for dc_name, dc in data_class_set.items()
+            if include_optional or not dc.optional
+        }
     else:
-        tasks_to_run = [
-            dc
+        tasks_to_run = {
+            dc_name: dc
             for dc_name, dc in data_class_set.items()
             if dc_name in set(tasks_include)
-        ]
+        }
 
-    tmpdir = Path(mkdtemp(dir=INGEST_WIP_DIR, prefix=f"{TODAY}_"))
+    configure_ingest(settings)
+
+    tmpdir = Path(mkdtemp(dir=INGEST_WIP_DIR, prefix=f"{date.today()}_"))
     # NOTE: mkdtemp always creates directories with 0700. Therefore:
     tmpdir.chmod(0o755)
 
-    for ingest_task in tasks_to_run:
-        ingest_task.ingest(ingest_tmpdir=tmpdir)
+    live_manifest = read_manifest(output_dir)
+    if incremental and live_manifest is None:
+        logger.warning(f"No manifest found in '{output_dir}'; running all tasks.")
+
+    reporter = RunReporter(data_source=source, jobs=jobs)
+    succeeded = False
+    try:
+        manifest_entries = run_ingest_tasks(
+            tasks_to_run,
+            run_task=reporter.instrument(
+                partial(
+                    ingest_with_manifest,
+                    ingest_tmpdir=tmpdir,
+                    live_dir=output_dir,
+                    live_manifest=live_manifest,
+                    incremental=incremental,
+                ),
+                ingest_tmpdir=tmpdir,
+            ),
+            jobs=jobs,
+        )
+        write_manifest(manifest_entries, ingest_tmpdir=tmpdir)
+        succeeded = True
+    finally:
+        reporter.write(ingest_tmpdir=tmpdir, succeeded=succeeded)
+
+    # A partial run's outputs don't include everything they reference
+    if not tasks_include:
+        check_references(tmpdir, strict=settings.strict_references)
+
+    precompress_outputs(
+        tmpdir,
+        live_dir=output_dir,
+        brotli=settings.precompress_brotli,
+    )
 
     if dry_run or tasks_include:
         desc = "dry" if dry_run else "partial"
@@ -234,41 +618,9 @@ def _ingest(  # noqa: C901
         )
         return
 
-    bkp_dir = _unique_backup_dir(OUTPUT_BKP_DIR / source)
-    if output_dir.is_dir():
-        if keep_backup:
-            # Swap: Live -> backup
-            bkp_dir.parent.mkdir(parents=True, exist_ok=True)
-            output_dir.rename(bkp_dir)
-            logger.info(f"Backed up '{output_dir}' to '{bkp_dir}'.")
-        else:
-            # Delete: Live
-            rmtree(output_dir)
-    else:
-        # If it doesn't exist, ensure its parents do:
-        output_dir.parent.mkdir(parents=True, exist_ok=True)
-
-    # Swap: New -> Live
-    tmpdir.rename(output_dir)
+    publish(tmpdir, live_dir=output_dir, source=source, keep_backup=keep_backup)
     logger.success(f"🎉 Ingested to '{output_dir}'.")
 
 
-def _unique_backup_dir(parent: Path) -> Path:
-    """Generate a backup directory path that doesn't conflict.
-
-    In case multiple runs are taken in a single day, we don't want the program to fail
-    creating a backup dir.
-    """
-    dirname = f"bkp-{TODAY}"
-    path = parent / dirname
-
-    counter = 1
-    while path.is_dir():
-        path = parent / f"{dirname}_{counter}"
-        counter = counter + 1
-
-    return path
-
-
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,112 @@
+"""Reuse COGs converted by previous ingests.
+
+Many GeoTIFFs (e.g. climatologies) are identical from one day to the next. Cached COGs
+are keyed by the input's content, the creation options, and the GDAL version, so a
+cached COG is only reused if converting again would produce the same output.
+
+Cache entries are hardlinked to and from ingest outputs, so a cache hit costs no time or
+disk space. The least recently used entries are evicted when the cache grows too big.
+Each entry's last use is the modification time of an empty marker file beside it: the
+COG's own timestamps are shared with its published links.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+
+from loguru import logger
+
+from snow_today_webapp_ingest.constants.paths import COG_CACHE_DIR
+
+COG_CACHE_MAX_BYTES = 20 * 1024**3
+
+
+def cog_cache_key(
+    input_sha256: str,
+    *,
+    creation_options: list[str],
+    no_data_value: int | None,
+    gdal_version: str,
+) -> str:
+    key = json.dumps([input_sha256, creation_options, no_data_value, gdal_version])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _cache_path(key: str) -> Path:
+    return COG_CACHE_DIR / key[:2] / f"{key}.tif"
+
+
+def _used_marker_path(cache_path: Path) -> Path:
+    return cache_path.with_suffix(".used")
+
+
+def _mark_used(cache_path: Path) -> None:
+    """Record that `cache_path` was used now, for eviction."""
+    _used_marker_path(cache_path).touch()
+
+
+def _last_used(cache_path: Path, stat: os.stat_result) -> float:
+    try:
+        return _used_marker_path(cache_path).stat().st_mtime
+    except FileNotFoundError:
+        # e.g. cached before markers were written
+        return stat.st_mtime
+
+
+def link_from_cache(key: str, output_path: Path) -> bool:
+    """Hardlink the cached COG for `key` to `output_path`. Return whether it existed."""
+    cache_path = _cache_path(key)
+    try:
+        os.link(cache_path, output_path)
+    except FileNotFoundError:
+        return False
+
+    _mark_used(cache_path)
+    return True
+
+
+def add_to_cache(key: str, cog_path: Path) -> None:
+    """Hardlink `cog_path` into the cache.
+
+    Failure isn't fatal: the COG will just be converted again next time.
+    """
+    cache_path = _cache_path(key)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Link to a temporary name first, so the cache never has a partial entry
+        tmp_path = cache_path.with_name(f".{uuid.uuid4().hex}.tmp")
+        os.link(cog_path, tmp_path)
+        os.replace(tmp_path, cache_path)
+        _mark_used(cache_path)
+    except OSError as e:
+        logger.warning(f"Failed to cache {cog_path}: {e}")
+
+
+def prune_cog_cache(*, max_bytes: int = COG_CACHE_MAX_BYTES) -> int:
+    """Delete the least recently used entries until the cache fits in `max_bytes`.
+
+    Returns the number of bytes freed.
+    """
+    entries = sorted(
+        ((path, path.stat()) for path in COG_CACHE_DIR.glob("*/*.tif")),
+        key=lambda entry: _last_used(*entry),
+        reverse=True,
+    )
+
+    total_bytes = 0
+    freed_bytes = 0
+    for path, stat in entries:
+        total_bytes += stat.st_size
+        if total_bytes <= max_bytes:
+            continue
+
+        path.unlink(missing_ok=True)
+        _used_marker_path(path).unlink(missing_ok=True)
+        freed_bytes += stat.st_size
+        logger.debug(f"Evicted {path} from COG cache")
+
+    if freed_bytes:
+        logger.info(f"Evicted {freed_bytes / 1024**2:.1f}MB from COG cache.")
+    return freed_bytes
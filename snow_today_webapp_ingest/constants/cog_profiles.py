@@ -0,0 +1,16 @@
+from typing import Final
+
+from snow_today_webapp_ingest.types_.cog_profile import CogProfile
+from snow_today_webapp_ingest.types_.cog_profile_name import CogProfileName
+
+# Select one for a variable with `cogProfile` in the variables index. Compare them with
+# `benchmark cog-profiles`.
+COG_PROFILES: Final[dict[CogProfileName, CogProfile]] = {
+    # What we've always used; compatible with every client
+    "lzw": CogProfile(compress="LZW"),
+    "deflate": CogProfile(compress="DEFLATE", level=9, predictor=2),
+    # Usually smaller and faster to decode than DEFLATE, but not all clients support it
+    "zstd": CogProfile(compress="ZSTD", level=15, predictor=2),
+    "zstd-fast": CogProfile(compress="ZSTD", level=1, predictor=2),
+}
+DEFAULT_COG_PROFILE: Final[CogProfileName] = "lzw"
@@ -0,0 +1,57 @@
+"""Names of output data classes, and the data source each belongs to.
+
+These are kept separate from the data class definitions in
+`snow_today_webapp_ingest.data_classes` so that the CLI can offer them as choices
+without importing any ingest code.
+"""
+
+from typing import Final, Literal
+
+from snow_today_webapp_ingest.types_.data_sources import DataSource
+
+OutputDataClassName = Literal[
+    "colormapsIndex",
+    "sspVariablesIndex",
+    "sweVariablesIndex",
+    "superRegionsIndex",
+    "subRegionsIndex",
+    "subRegionCollectionsIndex",
+    "subRegionsHierarchy",
+    "swePointsJson",
+    "plotsJson",
+    "regionShapes",
+    "cogs",
+    "sweLegends",
+    "sspLegends",
+    "rasterTiles",
+]
+OUTPUT_DATA_CLASS_SOURCES: Final[dict[OutputDataClassName, DataSource]] = {
+    "colormapsIndex": "common",
+    "sspVariablesIndex": "snow-surface-properties",
+    "sweVariablesIndex": "snow-water-equivalent",
+    "superRegionsIndex": "snow-surface-properties",
+    "subRegionsIndex": "snow-surface-properties",
+    "subRegionCollectionsIndex": "snow-surface-properties",
+    "subRegionsHierarchy": "snow-surface-properties",
+    "swePointsJson": "snow-water-equivalent",
+    "plotsJson": "snow-surface-properties",
+    "regionShapes": "snow-surface-properties",
+    "cogs": "snow-surface-properties",
+    "sweLegends": "snow-water-equivalent",
+    "sspLegends": "snow-surface-properties",
+    "rasterTiles": "snow-surface-properties",
+}
+OUTPUT_DATA_CLASS_NAMES = list(OUTPUT_DATA_CLASS_SOURCES.keys())
+
+
+def _names_from_source(data_source: DataSource) -> list[OutputDataClassName]:
+    return [
+        name
+        for name, source in OUTPUT_DATA_CLASS_SOURCES.items()
+        if source == data_source
+    ]
+
+
+SWE_OUTPUT_DATA_CLASS_NAMES = _names_from_source("snow-water-equivalent")
+SSP_OUTPUT_DATA_CLASS_NAMES = _names_from_source("snow-surface-properties")
+COMMON_OUTPUT_DATA_CLASS_NAMES = _names_from_source("common")
@@ -1,3 +0,0 @@
-from datetime import date
-
-TODAY = date.today()
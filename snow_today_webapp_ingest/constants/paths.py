@@ -11,6 +11,7 @@ STORAGE_DIR = Path(os.environ.get("STORAGE_DIR", storage_dir_default))
 # Static data in this repo
 ###############################################
 REPO_ROOT_DIR = Path(__file__).parent.parent.parent.absolute()
+REPO_PACKAGE_DIR = REPO_ROOT_DIR / 'snow_today_webapp_ingest'
 
 # Dir where static data is stored
 REPO_STATIC_DATA_DIR = REPO_ROOT_DIR / 'static'
@@ -34,6 +35,9 @@ REPO_STATIC_SCHEMAS_DIR = REPO_ROOT_DIR / 'schema'
 # Where this program will write temporary directories to store WIP ingest outputs
 INGEST_WIP_DIR = STORAGE_DIR / 'ingest-wip'
 
+# Where `ingest watch` remembers which deliveries it has already ingested
+INGEST_WATCH_STATE_FP = STORAGE_DIR / 'ingest-watch-state.json'
+
 # These are relative Paths because they will be created inside temporary WIP
 # directories, so we don't know their parents yet.
 # TODO: This is a really unreadable way to express directory structure.
@@ -41,23 +45,37 @@ OUTPUT_REGIONS_SUBDIR = Path('regions')
 OUTPUT_REGIONS_SHAPES_SUBDIR = OUTPUT_REGIONS_SUBDIR / "shapes"
 OUTPUT_REGIONS_COGS_SUBDIR = OUTPUT_REGIONS_SUBDIR / "cogs"
 OUTPUT_LEGENDS_SUBDIR = OUTPUT_REGIONS_SUBDIR / "legends"
+OUTPUT_REGIONS_TILES_SUBDIR = OUTPUT_REGIONS_SUBDIR / "tiles"
 OUTPUT_PLOTS_SUBDIR = Path('plots')
 OUTPUT_POINTS_SUBDIR = Path('points')
+# Records each task's input fingerprint and outputs; enables incremental ingest
+OUTPUT_INGEST_MANIFEST_FILE = Path('ingest-manifest.json')
+# Timings, file counts, and sizes for each task
+OUTPUT_RUN_REPORT_FILE = Path('run-report.json')
+# Each task writes here first, so we know exactly which files it output
+INGEST_STAGING_SUBDIR = Path('.staging')
 
 # Where the live data goes after ingest is successful
 OUTPUT_LIVE_DIR = STORAGE_DIR / 'live'
 OUTPUT_LIVE_SSP_DIR = OUTPUT_LIVE_DIR / 'snow-surface-properties'
 OUTPUT_LIVE_SWE_DIR = OUTPUT_LIVE_DIR / 'snow-water-equivalent'
 OUTPUT_LIVE_COMMON_DIR = OUTPUT_LIVE_DIR / 'common'
+# The live dirs above are symlinks to immutable versions stored here
+OUTPUT_LIVE_VERSIONS_DIR = OUTPUT_LIVE_DIR / '.versions'
 
 # Every successful ingest also creates a backup
 OUTPUT_BKP_DIR = STORAGE_DIR / 'bkp'
 
+# COGs from previous ingests, reused when the same input is converted the same way
+COG_CACHE_DIR = STORAGE_DIR / 'cog-cache'
+
 ###############################################
 # Inputs generated by upstream program
 ###############################################
 
 INCOMING_DIR = STORAGE_DIR / 'incoming'
+# Created in a data source's incoming dir when the upstream has finished sending data
+INCOMING_TRIGGER_FILENAME = 'TRIGGER'
 
 INCOMING_SSP_DIR = INCOMING_DIR / 'snow-surface-properties'
 INCOMING_REGIONS_DIR = INCOMING_SSP_DIR / 'regions'
@@ -5,14 +5,23 @@ NOT to be confused with dataclasses (no underscore). I'm sorry.
 TODO: Better name! "Data types" isn't much better. "Data kinds"?
 """
 
+import importlib
 import re
 from dataclasses import dataclass
 from functools import partial
 from pathlib import Path
-from typing import Final, Literal, ParamSpec, Protocol, TypeVar
+from typing import Any, Final, ParamSpec, Protocol, TypeVar
 
 from loguru import logger
 
+from snow_today_webapp_ingest.constants.data_classes import (
+    COMMON_OUTPUT_DATA_CLASS_NAMES,
+    OUTPUT_DATA_CLASS_NAMES,
+    OUTPUT_DATA_CLASS_SOURCES,
+    SSP_OUTPUT_DATA_CLASS_NAMES,
+    SWE_OUTPUT_DATA_CLASS_NAMES,
+    OutputDataClassName,
+)
 from snow_today_webapp_ingest.constants.paths import (
     INCOMING_PLOT_JSON_DIR,
     INCOMING_REGIONS_COLLECTIONS_JSON,
@@ -27,21 +36,11 @@ from snow_today_webapp_ingest.constants.paths import (
     OUTPUT_REGIONS_COGS_SUBDIR,
     OUTPUT_REGIONS_SHAPES_SUBDIR,
     OUTPUT_REGIONS_SUBDIR,
+    OUTPUT_REGIONS_TILES_SUBDIR,
     REPO_STATIC_COLORMAPS_INDEX_FP,
     REPO_STATIC_SSP_VARIABLES_INDEX_FP,
     REPO_STATIC_SWE_VARIABLES_INDEX_FP,
 )
-from snow_today_webapp_ingest.ingest.cogs import ingest_cogs
-from snow_today_webapp_ingest.ingest.geojson import fix_and_ingest_geojson
-from snow_today_webapp_ingest.ingest.legends import (
-    generate_ssp_legends,
-    generate_swe_legends,
-)
-from snow_today_webapp_ingest.ingest.swe_json import ingest_swe_json
-from snow_today_webapp_ingest.ingest.validate_and_copy_json import (
-    validate_and_copy_json,
-    validate_and_copy_json_matching_pattern,
-)
 from snow_today_webapp_ingest.types_.colormaps import ColormapsIndex
 from snow_today_webapp_ingest.types_.data_sources import DataSource
 from snow_today_webapp_ingest.types_.plot import PlotPayload
@@ -75,9 +74,33 @@ class IngestFunc(Protocol[FromPath, P]):
         pass
 
 
-# TODO: Keep track of all tasks created with an `instances` class variable? Then we
-# can save info about execution (e.g. time, errors messages, warnings, successes)
-# and generate a report? This feels like writing a task management tool...
+class LazyIngestFunc:
+    """An ingest function which isn't imported until it's called.
+
+    Some ingest functions depend on slow-to-import libraries (e.g. matplotlib), which
+    shouldn't be imported unless those functions are going to run. `kwargs` are bound
+    to the function like `functools.partial`.
+    """
+
+    def __init__(self, module: str, name: str, **kwargs: Any) -> None:
+        # Module within `snow_today_webapp_ingest.ingest` which defines the function
+        self.module = module
+        self.name = name
+        self.kwargs = kwargs
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.module}.{self.name}, {self.kwargs})"
+
+    def resolve(self) -> IngestFunc:
+        module = importlib.import_module(
+            f"snow_today_webapp_ingest.ingest.{self.module}",
+        )
+        return partial(getattr(module, self.name), **self.kwargs)
+
+    def __call__(self, from_path: Path | dict[str, Path], to_path: Path) -> None:
+        self.resolve()(from_path=from_path, to_path=to_path)
+
+
 @dataclass
 class OutputDataClassIngestTask:
     """Information needed to ingest a class of data."""
@@ -90,7 +113,7 @@ class OutputDataClassIngestTask:
     to_relative_path: Path | str
 
     # The function that is executed to ingest data.
-    ingest_func: IngestFunc
+    ingest_func: LazyIngestFunc
 
 
 @dataclass
@@ -111,6 +134,15 @@ class OutputDataClass:
     data_source: DataSource
     ingest_task: OutputDataClassIngestTask
 
+    # Other data classes (of the same data source) which must be successfully ingested
+    # before this one starts. Tasks without dependencies between them may run
+    # concurrently.
+    depends_on: tuple[OutputDataClassName, ...] = ()
+
+    # Optional data classes are only ingested when requested, e.g. because they're
+    # expensive and not yet used by the webapp.
+    optional: bool = False
+
     def ingest(self, *, ingest_tmpdir: Path) -> None:
         """Run the ingest task associated with this data class.
 
@@ -125,21 +157,7 @@ class OutputDataClass:
 
 
 _IngestTask = OutputDataClassIngestTask
-OutputDataClassName = Literal[
-    "colormapsIndex",
-    "sspVariablesIndex",
-    "sweVariablesIndex",
-    "superRegionsIndex",
-    "subRegionsIndex",
-    "subRegionCollectionsIndex",
-    "subRegionsHierarchy",
-    "swePointsJson",
-    "plotsJson",
-    "regionShapes",
-    "cogs",
-    "sweLegends",
-    "sspLegends",
-]
+_Lazy = LazyIngestFunc
 OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
     # NOTE: We ingest some static data every day, like colormaps and variables, because
     # we want the ingests to be idempotent. The previous model wrote dynamic data next
@@ -149,8 +167,9 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
         description="Ingest metadata: version-controlled colormaps JSON",
         data_source="common",
         ingest_task=_IngestTask(
-            ingest_func=partial(
-                validate_and_copy_json,
+            ingest_func=_Lazy(
+                "validate_and_copy_json",
+                "validate_and_copy_json",
                 model=ColormapsIndex,
             ),
             from_path=REPO_STATIC_COLORMAPS_INDEX_FP,
@@ -164,8 +183,9 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
             # TODO: Filter to only the variables that we care about (based on what are
             #       shown in `regions/root.json`). This means passing in additional
             #       `from_path`s and using a more complex `ingest_func`.
-            ingest_func=partial(
-                validate_and_copy_json,
+            ingest_func=_Lazy(
+                "validate_and_copy_json",
+                "validate_and_copy_json",
                 model=SatelliteVariablesIndex,
             ),
             from_path=REPO_STATIC_SSP_VARIABLES_INDEX_FP,
@@ -176,8 +196,9 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
         description="Ingest metadata: version-controlled SWE variable JSON",
         data_source="snow-water-equivalent",
         ingest_task=_IngestTask(
-            ingest_func=partial(
-                validate_and_copy_json,
+            ingest_func=_Lazy(
+                "validate_and_copy_json",
+                "validate_and_copy_json",
                 model=SweVariablesIndex,
             ),
             from_path=REPO_STATIC_SWE_VARIABLES_INDEX_FP,
@@ -188,8 +209,9 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
         description="Ingest metadata: index of super-regions JSON",
         data_source="snow-surface-properties",
         ingest_task=_IngestTask(
-            ingest_func=partial(
-                validate_and_copy_json,
+            ingest_func=_Lazy(
+                "validate_and_copy_json",
+                "validate_and_copy_json",
                 model=SuperRegionsIndex,
             ),
             from_path=INCOMING_REGIONS_ROOT_JSON,
@@ -201,8 +223,9 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
         description="Ingest metadata: indexes of sub-regions within each super-region",
         data_source="snow-surface-properties",
         ingest_task=_IngestTask(
-            ingest_func=partial(
-                validate_and_copy_json_matching_pattern,
+            ingest_func=_Lazy(
+                "validate_and_copy_json",
+                "validate_and_copy_json_matching_pattern",
                 model=SubRegionsIndex,
                 pattern=re.compile(r'^\d+.json$'),
             ),
@@ -215,8 +238,9 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
         description="Ingest metadata: index of sub-region collections",
         data_source="snow-surface-properties",
         ingest_task=_IngestTask(
-            ingest_func=partial(
-                validate_and_copy_json,
+            ingest_func=_Lazy(
+                "validate_and_copy_json",
+                "validate_and_copy_json",
                 model=SubRegionCollectionsIndex,
             ),
             from_path=INCOMING_REGIONS_COLLECTIONS_JSON,
@@ -232,8 +256,9 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
         ),
         data_source="snow-surface-properties",
         ingest_task=_IngestTask(
-            ingest_func=partial(
-                validate_and_copy_json_matching_pattern,
+            ingest_func=_Lazy(
+                "validate_and_copy_json",
+                "validate_and_copy_json_matching_pattern",
                 model=SubRegionsHierarchy,
                 pattern=re.compile(r'^\d+_hierarchy.json$'),
             ),
@@ -245,7 +270,7 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
         description="Ingest data: Snow Water Equivalent points JSON",
         data_source="snow-water-equivalent",
         ingest_task=_IngestTask(
-            ingest_func=ingest_swe_json,
+            ingest_func=_Lazy("swe_json", "ingest_swe_json"),
             from_path=INCOMING_SWE_POINTS_DIR,
             to_relative_path=OUTPUT_POINTS_SUBDIR,
         ),
@@ -254,11 +279,12 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
     #       (super- or sub-) and variable combination.
     # TODO: Update some metadata file so it references these files.
     "plotsJson": OutputDataClass(
-        description="Ingest data: Plot JSON for each region/variable",
+        description="Ingest data: Plot JSON and binary for each region/variable",
         data_source="snow-surface-properties",
         ingest_task=_IngestTask(
-            ingest_func=partial(
-                validate_and_copy_json_matching_pattern,
+            ingest_func=_Lazy(
+                "plots",
+                "ingest_plots",
                 model=PlotPayload,
                 pattern=re.compile(r'\d+_\d{2}.json'),
             ),
@@ -277,7 +303,7 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
             # TODO: Restore. This was temporarily commented because the incoming GeoJSON
             #       had some compatibility problems.
             # ingest_func=copy_files,
-            ingest_func=fix_and_ingest_geojson,
+            ingest_func=_Lazy("geojson", "fix_and_ingest_geojson"),
             from_path=INCOMING_SHAPES_DIR,
             to_relative_path=OUTPUT_REGIONS_SHAPES_SUBDIR,
         ),
@@ -290,7 +316,7 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
         ),
         data_source="snow-surface-properties",
         ingest_task=_IngestTask(
-            ingest_func=ingest_cogs,
+            ingest_func=_Lazy("cogs", "ingest_cogs"),
             from_path=INCOMING_TIF_DIR,
             to_relative_path=OUTPUT_REGIONS_COGS_SUBDIR,
         ),
@@ -301,36 +327,70 @@ OUTPUT_DATA_CLASSES: Final[dict[OutputDataClassName, OutputDataClass]] = {
         description="Ingest metadata: legends SVG for each super-region/variable",
         data_source="snow-surface-properties",
         ingest_task=_IngestTask(
-            ingest_func=generate_ssp_legends,
+            ingest_func=_Lazy("legends", "generate_ssp_legends"),
             from_path=INCOMING_REGIONS_ROOT_JSON,
             to_relative_path=OUTPUT_LEGENDS_SUBDIR,
         ),
+        # Don't generate legends from metadata that hasn't been validated:
+        depends_on=("superRegionsIndex", "sspVariablesIndex"),
+    ),
+    "rasterTiles": OutputDataClass(
+        description=(
+            "Ingest data: colorized XYZ map tiles for each super-region/variable"
+        ),
+        data_source="snow-surface-properties",
+        ingest_task=_IngestTask(
+            ingest_func=_Lazy("raster_tiles", "render_raster_tiles"),
+            # NOTE: Rendered from the incoming GeoTIFFs, not the COGs; tasks can't read
+            # each other's outputs. The pixels are the same.
+            from_path={
+                "regions": INCOMING_REGIONS_ROOT_JSON,
+                "geotiffs": INCOMING_TIF_DIR,
+            },
+            to_relative_path=OUTPUT_REGIONS_TILES_SUBDIR,
+        ),
+        # Don't render GeoTIFFs that failed to convert, or with unvalidated metadata:
+        depends_on=("superRegionsIndex", "sspVariablesIndex", "cogs"),
+        optional=True,
     ),
     "sweLegends": OutputDataClass(
         description="Ingest metadata: legends SVG for each SWE variable",
         data_source="snow-water-equivalent",
         ingest_task=_IngestTask(
-            ingest_func=generate_swe_legends,
+            ingest_func=_Lazy("legends", "generate_swe_legends"),
             from_path=REPO_STATIC_SWE_VARIABLES_INDEX_FP,
             to_relative_path=OUTPUT_LEGENDS_SUBDIR,
         ),
+        depends_on=("sweVariablesIndex",),
     ),
 }
+if {k: v.data_source for k, v in OUTPUT_DATA_CLASSES.items()} != (
+    OUTPUT_DATA_CLASS_SOURCES
+):
+    raise RuntimeError(
+        "Programmer error: `OUTPUT_DATA_CLASSES` doesn't match"
+        " `OUTPUT_DATA_CLASS_SOURCES`."
+    )
+
 SWE_OUTPUT_DATA_CLASSES, SSP_OUTPUT_DATA_CLASSES, COMMON_OUTPUT_DATA_CLASSES = (
-    {k: v for k, v in OUTPUT_DATA_CLASSES.items() if v.data_source == data_source}
-    for data_source in ["snow-water-equivalent", "snow-surface-properties", "common"]
-)
-(
-    OUTPUT_DATA_CLASS_NAMES,
-    SWE_OUTPUT_DATA_CLASS_NAMES,
-    SSP_OUTPUT_DATA_CLASS_NAMES,
-    COMMON_OUTPUT_DATA_CLASS_NAMES,
-) = (
-    list(dct.keys())
-    for dct in (
-        OUTPUT_DATA_CLASSES,
-        SWE_OUTPUT_DATA_CLASSES,
-        SSP_OUTPUT_DATA_CLASSES,
-        COMMON_OUTPUT_DATA_CLASSES,
+    {k: v for k, v in OUTPUT_DATA_CLASSES.items() if k in names}
+    for names in (
+        SWE_OUTPUT_DATA_CLASS_NAMES,
+        SSP_OUTPUT_DATA_CLASS_NAMES,
+        COMMON_OUTPUT_DATA_CLASS_NAMES,
     )
 )
+__all__ = [
+    "COMMON_OUTPUT_DATA_CLASSES",
+    "COMMON_OUTPUT_DATA_CLASS_NAMES",
+    "OUTPUT_DATA_CLASSES",
+    "OUTPUT_DATA_CLASS_NAMES",
+    "SSP_OUTPUT_DATA_CLASSES",
+    "SSP_OUTPUT_DATA_CLASS_NAMES",
+    "SWE_OUTPUT_DATA_CLASSES",
+    "SWE_OUTPUT_DATA_CLASS_NAMES",
+    "LazyIngestFunc",
+    "OutputDataClass",
+    "OutputDataClassIngestTask",
+    "OutputDataClassName",
+]
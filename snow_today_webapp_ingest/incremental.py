@@ -0,0 +1,175 @@
+"""Skip ingest tasks whose inputs haven't changed since the live data was ingested.
+
+Every ingest writes a manifest recording, for each task, a fingerprint of its inputs
+and the list of files it output. When ingesting incrementally, a task whose fingerprint
+matches the live manifest isn't run; its outputs are hardlinked from the live directory
+instead.
+"""
+
+import hashlib
+import os
+from functools import cache
+from pathlib import Path
+from shutil import rmtree
+
+from loguru import logger
+from pydantic import ValidationError
+
+from snow_today_webapp_ingest.constants.paths import (
+    INGEST_STAGING_SUBDIR,
+    OUTPUT_INGEST_MANIFEST_FILE,
+    REPO_PACKAGE_DIR,
+    REPO_STATIC_DATA_DIR,
+)
+from snow_today_webapp_ingest.data_classes import (
+    OutputDataClass,
+    OutputDataClassName,
+)
+from snow_today_webapp_ingest.report import record_metric
+from snow_today_webapp_ingest.settings import ingest_settings
+from snow_today_webapp_ingest.types_.manifest import (
+    IngestManifest,
+    IngestManifestEntry,
+)
+from snow_today_webapp_ingest.util.hashing import sha256_file
+
+
+@cache
+def code_version() -> str:
+    """Hash the ingest code and the version-controlled static data.
+
+    Some tasks read static data which isn't in their `from_path`, e.g. legends read
+    colormaps, so any change to either code or static data invalidates every
+    fingerprint.
+    """
+    digest = hashlib.sha256()
+    _update_digest(digest, REPO_PACKAGE_DIR, glob="*.py")
+    _update_digest(digest, REPO_STATIC_DATA_DIR)
+    return digest.hexdigest()
+
+
+def fingerprint_inputs(from_path: Path | dict[str, Path]) -> str:
+    """Hash the contents of all files in `from_path`, the code version and settings."""
+    paths = from_path if isinstance(from_path, dict) else {"": from_path}
+
+    digest = hashlib.sha256(code_version().encode())
+    digest.update(ingest_settings().output_fingerprint().encode())
+    for name, path in sorted(paths.items()):
+        digest.update(name.encode())
+        _update_digest(digest, path)
+    return digest.hexdigest()
+
+
+def _update_digest(digest, path: Path, *, glob: str = "*") -> None:
+    if path.is_file():
+        files = [path]
+        base_dir = path.parent
+    elif path.is_dir():
+        files = sorted(f for f in path.rglob(glob) if f.is_file())
+        base_dir = path
+    else:
+        # The task will most likely fail, but that's for the task to decide.
+        digest.update(f"missing:{path}".encode())
+        return
+
+    for file in files:
+        digest.update(str(file.relative_to(base_dir)).encode())
+        digest.update(sha256_file(file).encode())
+
+
+def read_manifest(output_dir: Path) -> IngestManifest | None:
+    """Read the manifest written by the ingest which produced `output_dir`."""
+    manifest_fp = output_dir / OUTPUT_INGEST_MANIFEST_FILE
+    if not manifest_fp.is_file():
+        return None
+
+    try:
+        return IngestManifest.model_validate_json(manifest_fp.read_bytes())
+    except ValidationError as e:
+        logger.warning(f"Ignoring invalid manifest {manifest_fp}: {e}")
+        return None
+
+
+def write_manifest(
+    entries: dict[OutputDataClassName, IngestManifestEntry],
+    *,
+    ingest_tmpdir: Path,
+) -> None:
+    manifest = IngestManifest.model_validate(entries)
+    (ingest_tmpdir / OUTPUT_INGEST_MANIFEST_FILE).write_text(
+        manifest.model_dump_json(by_alias=True, indent=2),
+    )
+    rmtree(ingest_tmpdir / INGEST_STAGING_SUBDIR, ignore_errors=True)
+
+
+def ingest_with_manifest(
+    name: OutputDataClassName,
+    data_class: OutputDataClass,
+    *,
+    ingest_tmpdir: Path,
+    live_dir: Path,
+    live_manifest: IngestManifest | None,
+    incremental: bool,
+) -> IngestManifestEntry:
+    """Ingest `data_class` to `ingest_tmpdir` and return its manifest entry.
+
+    If `incremental`, and the inputs are unchanged since the live data was ingested,
+    hardlink the live outputs instead of running the task.
+    """
+    fingerprint = fingerprint_inputs(data_class.ingest_task.from_path)
+    staging_dir = ingest_tmpdir / INGEST_STAGING_SUBDIR / name
+
+    live_entry = live_manifest.root.get(name) if live_manifest else None
+    if incremental and live_entry is not None and live_entry.fingerprint == fingerprint:
+        if _link_outputs(live_entry.outputs, from_dir=live_dir, to_dir=staging_dir):
+            _merge_outputs(staging_dir, into_dir=ingest_tmpdir)
+            record_metric("reusedLiveOutputs", True)
+            logger.success(
+                "⏩⏩⏩ Inputs unchanged; reused live outputs"
+                f" - {data_class.description} ⏩⏩⏩"
+            )
+            return live_entry
+
+        logger.warning(f"Live outputs of {name} are incomplete; ingesting instead.")
+        rmtree(staging_dir, ignore_errors=True)
+
+    record_metric("reusedLiveOutputs", False)
+    data_class.ingest(ingest_tmpdir=staging_dir)
+    outputs = _merge_outputs(staging_dir, into_dir=ingest_tmpdir)
+    return IngestManifestEntry(fingerprint=fingerprint, outputs=outputs)
+
+
+def _link_outputs(outputs: list[Path], *, from_dir: Path, to_dir: Path) -> bool:
+    """Hardlink `outputs` from `from_dir` to `to_dir`. Return success."""
+    for output in outputs:
+        to_fp = to_dir / output
+        to_fp.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(from_dir / output, to_fp)
+        except OSError as e:
+            logger.debug(f"Failed to link {output} from {from_dir}: {e}")
+            return False
+    return True
+
+
+def _merge_outputs(staging_dir: Path, *, into_dir: Path) -> list[Path]:
+    """Move all files in `staging_dir` to the same relative path in `into_dir`.
+
+    Returns the relative paths of the moved files.
+    """
+    outputs: list[Path] = []
+    for dirpath, _, filenames in os.walk(staging_dir):
+        for filename in filenames:
+            staged_fp = Path(dirpath) / filename
+            output = staged_fp.relative_to(staging_dir)
+            output_fp = into_dir / output
+
+            if output_fp.exists():
+                raise RuntimeError(f"{output} was output by more than one task")
+
+            output_fp.parent.mkdir(parents=True, exist_ok=True)
+            staged_fp.rename(output_fp)
+            outputs.append(output)
+
+    rmtree(staging_dir, ignore_errors=True)
+    return sorted(outputs)
@@ -1,41 +1,334 @@
 """Convert non-CO GeoTIFFs to Cloud-Optimized GeoTIFFs."""
 
-import subprocess
+import multiprocessing
+import os
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 from pprint import pformat
 
+import numpy as np
 from loguru import logger
 
+from snow_today_webapp_ingest.cog_cache import (
+    add_to_cache,
+    cog_cache_key,
+    link_from_cache,
+    prune_cog_cache,
+)
+from snow_today_webapp_ingest.constants.cog_profiles import (
+    COG_PROFILES,
+    DEFAULT_COG_PROFILE,
+)
+from snow_today_webapp_ingest.constants.paths import (
+    REPO_STATIC_SSP_VARIABLES_INDEX_FP,
+)
+from snow_today_webapp_ingest.report import record_file_peak_rss, record_metric
+from snow_today_webapp_ingest.settings import ingest_settings
+from snow_today_webapp_ingest.types_.cog_profile_name import CogProfileName
+from snow_today_webapp_ingest.types_.raster_stats import RasterHistogram, RasterStats
+from snow_today_webapp_ingest.types_.variables import (
+    SatelliteVariable,
+    SatelliteVariablesIndex,
+    WarpResampling,
+)
+from snow_today_webapp_ingest.util.cog_validation import (
+    count_omitted_blocks,
+    validate_cog,
+)
+from snow_today_webapp_ingest.util.error import InvalidCogError
+from snow_today_webapp_ingest.util.gdal import (
+    gdal_version,
+    init_gdal_worker,
+    translate,
+)
+from snow_today_webapp_ingest.util.hashing import sha256_file
+from snow_today_webapp_ingest.util.raster_stats import count_values
+from snow_today_webapp_ingest.util.resources import (
+    JobProcesses,
+    available_cpus,
+    available_memory_bytes,
+    init_job_process_worker,
+    measure_peak_rss,
+    report_job_process,
+    wait_for_memory,
+)
 
-def make_cloud_optimized(
+# GDAL's raster block cache for each conversion. Input GeoTIFFs are at most a few
+# hundred MB, so this holds a good fraction of one in memory.
+COG_GDAL_CACHEMAX_MB = 256
+# Memory used by each conversion on top of the block cache
+COG_WORKER_OVERHEAD_MB = 128
+# Larger inputs are converted straight to disk, instead of building the COG in memory
+COG_IN_MEMORY_MAX_BYTES = 512 * 1024**2
+# Number of bins in each COG's histogram, or fewer if there are fewer possible values
+COG_HISTOGRAM_BINS = 50
+COG_STATS_PERCENTILES = (2, 25, 50, 75, 98)
+# GDAL isn't safe to fork once initialized
+COG_WORKER_CONTEXT = multiprocessing.get_context('spawn')
+
+
+@dataclass(frozen=True)
+class CogWorkerBudget:
+    """How many conversions to run at once, and the resources each may use."""
+
+    workers: int
+    gdal_num_threads: int
+    gdal_cachemax_mb: int
+
+    @property
+    def gdal_config_options(self) -> dict[str, str]:
+        return {
+            "GDAL_NUM_THREADS": str(self.gdal_num_threads),
+            "GDAL_CACHEMAX": str(self.gdal_cachemax_mb),
+        }
+
+    def executor(
+        self,
+        job_processes: JobProcesses | None = None,
+    ) -> ProcessPoolExecutor:
+        """Start worker processes, each with GDAL set up to use its share.
+
+        If `job_processes` is set, jobs run with `report_job_process` report to it.
+        """
+        if job_processes is None:
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=COG_WORKER_CONTEXT,
+                initializer=init_gdal_worker,
+                initargs=(self.gdal_config_options,),
+            )
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=COG_WORKER_CONTEXT,
+            initializer=init_job_process_worker,
+            initargs=(
+                job_processes.starts,
+                init_gdal_worker,
+                self.gdal_config_options,
+            ),
+        )
+
+
+def cog_worker_budget(n_files: int) -> CogWorkerBudget:
+    """Share the available CPUs and memory between up to `n_files` conversions.
+
+    Each conversion gets a share of the CPUs for GDAL's own threads (e.g. compressing
+    overviews), so the total doesn't oversubscribe the machine.
+    """
+    cpus = available_cpus()
+    workers = min(n_files, cpus)
+
+    memory_bytes = available_memory_bytes()
+    if memory_bytes is not None:
+        worker_bytes = (COG_GDAL_CACHEMAX_MB + COG_WORKER_OVERHEAD_MB) * 1024**2
+        workers = min(workers, memory_bytes // worker_bytes)
+
+    workers = max(workers, 1)
+    return CogWorkerBudget(
+        workers=workers,
+        gdal_num_threads=max(cpus // workers, 1),
+        gdal_cachemax_mb=COG_GDAL_CACHEMAX_MB,
+    )
+
+
+@dataclass(frozen=True)
+class CogEncoding:
+    """How to convert an input to COG."""
+
+    profile_name: CogProfileName
+    # If set, reproject to Web Mercator with this resampling
+    warp_resampling: WarpResampling | None = None
+    # Declared as the COG's no-data value
+    no_data_value: int | None = None
+
+    @property
+    def creation_options(self) -> list[str]:
+        """Options for GDAL's COG driver."""
+        # Don't write blocks which are entirely no-data; readers fill them in. Much of
+        # each super-region's bounding box is outside the region.
+        options = [*COG_PROFILES[self.profile_name].creation_options, 'SPARSE_OK=TRUE']
+        if self.warp_resampling is None:
+            return options
+
+        # The tiling scheme sets the block size, and aligns blocks and overviews to web
+        # map tiles at each zoom level. Pixels outside the input are no-data, not an
+        # alpha band.
+        return [option for option in options if not option.startswith('BLOCKSIZE=')] + [
+            'TILING_SCHEME=GoogleMapsCompatible',
+            f'WARP_RESAMPLING={self.warp_resampling.upper()}',
+            'ADD_ALPHA=NO',
+        ]
+
+
+@dataclass(frozen=True)
+class CogConversion:
+    """Convert the first of `input_tif_paths`; link the result to the others.
+
+    The inputs are byte-identical, and are converted with the same encoding.
+    """
+
+    input_tif_paths: list[Path]
+    encoding: CogEncoding
+    cache_key: str
+
+
+def group_identical_files(paths: list[Path]) -> dict[str, list[Path]]:
+    """Group byte-identical files by their SHA256, preserving the order of `paths`."""
+    with ThreadPoolExecutor(
+        max_workers=available_cpus(),
+        thread_name_prefix='cogs-hash',
+    ) as executor:
+        digests = executor.map(sha256_file, paths)
+
+    groups: dict[str, list[Path]] = {}
+    for path, digest in zip(paths, digests, strict=True):
+        groups.setdefault(digest, []).append(path)
+    return groups
+
+
+def cog_variable(
+    input_tif_path: Path,
+    *,
+    variables_index: SatelliteVariablesIndex,
+) -> SatelliteVariable | None:
+    """Look up the variable in `{superRegionId}_{variableId}.tif`."""
+    _, _, variable_id = input_tif_path.stem.rpartition('_')
+    variable = variables_index.root.get(variable_id)
+    if variable is None:
+        logger.warning(f'No variable found for {input_tif_path.name}; using defaults')
+    return variable
+
+
+def cog_encoding(
+    variable: SatelliteVariable | None,
+    *,
+    web_mercator: bool,
+) -> CogEncoding:
+    """Return how to encode `variable`, reprojecting if `web_mercator`.
+
+    `variable` is None if the variable is unknown; defaults are used, and no no-data
+    value is declared.
+    """
+    if variable is None:
+        return CogEncoding(
+            profile_name=DEFAULT_COG_PROFILE,
+            warp_resampling='nearest' if web_mercator else None,
+        )
+
+    return CogEncoding(
+        profile_name=variable.cog_profile or DEFAULT_COG_PROFILE,
+        warp_resampling=(
+            (variable.warp_resampling or 'nearest') if web_mercator else None
+        ),
+        no_data_value=variable.no_data_value,
+    )
+
+
+def plan_cog_conversions(input_tif_paths: list[Path]) -> list[CogConversion]:
+    """Plan one conversion for each unique combination of input and encoding."""
+    variables_index = _read_variables_index()
+    web_mercator = ingest_settings().cog_web_mercator
+    version = gdal_version()
+
+    groups: dict[tuple[str, CogEncoding], list[Path]] = {}
+    # Super-regions MAY share identical files; only convert each unique file once.
+    for input_sha256, paths in group_identical_files(input_tif_paths).items():
+        for path in paths:
+            encoding = cog_encoding(
+                cog_variable(path, variables_index=variables_index),
+                web_mercator=web_mercator,
+            )
+            groups.setdefault((input_sha256, encoding), []).append(path)
+
+    return [
+        CogConversion(
+            input_tif_paths=paths,
+            encoding=encoding,
+            cache_key=cog_cache_key(
+                input_sha256,
+                creation_options=encoding.creation_options,
+                no_data_value=encoding.no_data_value,
+                gdal_version=version,
+            ),
+        )
+        for (input_sha256, encoding), paths in groups.items()
+    ]
+
+
+def _read_variables_index() -> SatelliteVariablesIndex:
+    return SatelliteVariablesIndex.model_validate_json(
+        REPO_STATIC_SSP_VARIABLES_INDEX_FP.read_bytes(),
+    )
+
+
+def conversion_memory_bytes(input_tif_path: Path) -> int:
+    """Estimate the most memory a worker will use to cloud-optimize `input_tif_path`."""
+    worker_bytes = (COG_GDAL_CACHEMAX_MB + COG_WORKER_OVERHEAD_MB) * 1024**2
+    input_bytes = input_tif_path.stat().st_size
+    if input_bytes > COG_IN_MEMORY_MAX_BYTES:
+        return worker_bytes
+    # The COG is built in memory; it's about the size of the (compressed) input.
+    return worker_bytes + input_bytes
+
+
+def submit_cloud_optimize(
+    executor: ProcessPoolExecutor,
     *,
+    job_id: int,
     input_tif_path: Path,
     output_tif_path: Path,
-) -> Path:
-    if output_tif_path.is_file():
-        output_tif_path.unlink()
-        logger.info(f'Removed {output_tif_path}')
-
-    # TODO: -a_nodata 65535? Currently nodata value is not defined in metadata.
-    subprocess.run(
-        (
-            f'gdal_translate "{input_tif_path}" "{output_tif_path}"'
-            ' -of COG'
-            ' -co "OVERVIEW_RESAMPLING=NEAREST"'
-            ' -co "COMPRESS=LZW"'
+    encoding: CogEncoding,
+) -> Future[tuple[Path, int | None]]:
+    """Cloud-optimize `input_tif_path` in a worker started by `CogWorkerBudget`.
+
+    The worker reports that it runs `job_id` to the executor's `JobProcesses`, if any.
+    The future's result is the output path and the worker's peak memory use.
+    """
+    return executor.submit(
+        report_job_process,
+        job_id,
+        partial(
+            measure_peak_rss,
+            translate,
+            input_tif_path,
+            output_tif_path,
+            output_format='COG',
+            creation_options=encoding.creation_options,
+            no_data_value=encoding.no_data_value,
+            in_memory=input_tif_path.stat().st_size <= COG_IN_MEMORY_MAX_BYTES,
         ),
-        shell=True,
     )
 
-    logger.info(f'Created COG {output_tif_path}')
-    return output_tif_path
+
+def link_identical_outputs(
+    output_tif_path: Path,
+    *,
+    identical_input_tif_paths: list[Path],
+) -> None:
+    """Hardlink `output_tif_path` to the output name of each identical input."""
+    for input_tif_path in identical_input_tif_paths:
+        link_path = output_tif_path.parent / input_tif_path.name
+        os.link(output_tif_path, link_path)
+        logger.info(f'Linked COG {link_path} to identical input')
 
 
 def ingest_cogs(
     from_path: Path,
     to_path: Path,
 ) -> None:
-    input_tifs = list(from_path.glob('*.tif'))
+    # Largest first, so a big file isn't left running alone at the end
+    input_tifs = sorted(
+        sorted(from_path.glob('*.tif')),
+        key=lambda p: p.stat().st_size,
+        reverse=True,
+    )
 
     if len(input_tifs) == 0:
         msg = f'Aborting: no inputs found at: {from_path}'
@@ -44,11 +337,242 @@ def ingest_cogs(
 
     input_tifs_pretty = pformat([str(p) for p in input_tifs])
     logger.info(f'Generating COGS from: {input_tifs_pretty}')
-
     to_path.mkdir(exist_ok=True, parents=True)
-    for input_tif in input_tifs:
-        logger.info(f'Cloud-optimizing input file {input_tif}...')
-        make_cloud_optimized(
-            input_tif_path=input_tif,
-            output_tif_path=(to_path / input_tif.name),
+
+    conversions = plan_cog_conversions(input_tifs)
+    record_metric('cogConversionsAvoided', len(input_tifs) - len(conversions))
+
+    to_convert = _link_cached_cogs(conversions, to_path=to_path)
+    record_metric('cogCacheHits', len(conversions) - len(to_convert))
+    if to_convert:
+        _convert_cogs(to_convert, to_path=to_path)
+
+    # Identical outputs are hardlinks, so only validate one of each
+    unique_cog_paths = [
+        to_path / conversion.input_tif_paths[0].name for conversion in conversions
+    ]
+    validate_cogs(
+        unique_cog_paths,
+        full=(ingest_settings().cog_validation == 'full'),
+    )
+    report_omitted_blocks(unique_cog_paths)
+    write_cog_stats(conversions, to_path=to_path)
+    prune_cog_cache()
+
+
+def validate_cogs(cog_paths: list[Path], *, full: bool) -> None:
+    """Validate `cog_paths` in parallel. Raise if any are invalid.
+
+    A broken COG would go live and make clients' range requests slow or fail.
+    """
+    with ProcessPoolExecutor(
+        max_workers=min(available_cpus(), len(cog_paths)),
+        mp_context=multiprocessing.get_context('spawn'),
+    ) as executor:
+        all_errors = executor.map(partial(validate_cog, full=full), cog_paths)
+        invalid = {
+            path: errors
+            for path, errors in zip(cog_paths, all_errors, strict=True)
+            if errors
+        }
+
+    if invalid:
+        for path, errors in invalid.items():
+            logger.error(f'Invalid COG {path.name}: {errors}')
+        raise InvalidCogError(
+            f'{len(invalid)} invalid COG(s): {sorted(p.name for p in invalid)}'
+        )
+
+    mode = 'full' if full else 'header'
+    logger.info(f'Validated {len(cog_paths)} COG(s) ({mode} check)')
+
+
+def report_omitted_blocks(cog_paths: list[Path]) -> None:
+    """Log and record how many empty blocks sparse COGs didn't store."""
+    omitted = blocks = 0
+    for path in cog_paths:
+        path_omitted, path_blocks = count_omitted_blocks(path)
+        omitted += path_omitted
+        blocks += path_blocks
+
+    record_metric('cogBlocks', blocks)
+    record_metric('cogEmptyBlocksOmitted', omitted)
+    if blocks:
+        logger.info(
+            f'Omitted {omitted} of {blocks} COG blocks'
+            f' ({omitted / blocks:.0%}) as entirely no-data'
+        )
+
+
+def write_cog_stats(conversions: list[CogConversion], *, to_path: Path) -> None:
+    """Write `{name}.stats.json` next to each COG, summarizing its values.
+
+    Each unique COG is read once, in parallel. Histograms span the variable's
+    `valueRange`, so they're comparable between days.
+    """
+    variables_index = _read_variables_index()
+    budget = cog_worker_budget(len(conversions))
+    with budget.executor() as executor:
+        all_counts = executor.map(
+            count_values,
+            [
+                to_path / conversion.input_tif_paths[0].name
+                for conversion in conversions
+            ],
+        )
+
+        for conversion, (counts, no_data_count) in zip(
+            conversions, all_counts, strict=True
+        ):
+            for input_tif_path in conversion.input_tif_paths:
+                variable = cog_variable(input_tif_path, variables_index=variables_index)
+                stats = summarize_value_counts(
+                    counts,
+                    no_data_count=no_data_count,
+                    value_range=variable.value_range if variable else None,
+                )
+                stats_path = to_path / f'{input_tif_path.stem}.stats.json'
+                stats_path.write_text(stats.model_dump_json(by_alias=True))
+
+    logger.info(f'Wrote stats for {len(conversions)} unique COG(s)')
+
+
+def summarize_value_counts(
+    counts: np.ndarray,
+    *,
+    no_data_count: int,
+    value_range: tuple[int, int] | None,
+) -> RasterStats:
+    """Summarize a raster from the number of pixels with each value.
+
+    If `value_range` is None, the histogram spans the values present.
+    """
+    present = np.flatnonzero(counts)
+    valid_pixels = int(counts.sum())
+    total_pixels = valid_pixels + no_data_count
+    no_data_fraction = no_data_count / total_pixels if total_pixels else 1.0
+    if not valid_pixels:
+        return RasterStats(
+            valid_pixels=0,
+            no_data_fraction=no_data_fraction,
+            min=None,
+            max=None,
+            mean=None,
+            percentiles={},
+            histogram=RasterHistogram(bin_edges=[], counts=[]),
+        )
+
+    cumulative = np.cumsum(counts)
+    percentiles = {
+        # Nearest rank: the lowest value with at least q% of pixels at or below it
+        f'p{q}': int(np.searchsorted(cumulative, q / 100 * valid_pixels))
+        for q in COG_STATS_PERCENTILES
+    }
+
+    low, high = value_range or (int(present[0]), int(present[-1]))
+    n_bins = min(COG_HISTOGRAM_BINS, high - low + 1)
+    bin_edges = np.linspace(low, high + 1, n_bins + 1)
+    bins = np.searchsorted(bin_edges, np.clip(present, low, high), side='right') - 1
+    histogram = np.bincount(bins, weights=counts[present], minlength=n_bins)
+
+    return RasterStats(
+        valid_pixels=valid_pixels,
+        no_data_fraction=no_data_fraction,
+        min=int(present[0]),
+        max=int(present[-1]),
+        mean=float(np.dot(present, counts[present]) / valid_pixels),
+        percentiles=percentiles,
+        histogram=RasterHistogram(
+            bin_edges=bin_edges.round(4).tolist(),
+            counts=histogram.astype(np.int64).tolist(),
+        ),
+    )
+
+
+def _link_cached_cogs(
+    conversions: list[CogConversion],
+    *,
+    to_path: Path,
+) -> list[CogConversion]:
+    """Link outputs from the COG cache. Return the conversions which weren't cached."""
+    not_cached: list[CogConversion] = []
+    for conversion in conversions:
+        first_input_tif, *other_input_tifs = conversion.input_tif_paths
+        output_tif_path = to_path / first_input_tif.name
+        if not link_from_cache(conversion.cache_key, output_tif_path):
+            not_cached.append(conversion)
+            continue
+
+        logger.info(f'Linked COG {output_tif_path} from cache')
+        link_identical_outputs(
+            output_tif_path,
+            identical_input_tif_paths=other_input_tifs,
         )
+
+    return not_cached
+
+
+def _convert_cogs(conversions: list[CogConversion], *, to_path: Path) -> None:
+    """Run `conversions` in parallel, and cache the results."""
+    budget = cog_worker_budget(len(conversions))
+    record_metric('cogWorkers', budget.workers)
+    logger.info(
+        f'Cloud-optimizing with {budget.workers} workers'
+        f' x {budget.gdal_num_threads} GDAL threads'
+        f' x {budget.gdal_cachemax_mb}MB GDAL cache'
+    )
+
+    job_processes = JobProcesses(COG_WORKER_CONTEXT)
+    with budget.executor(job_processes) as executor:
+        running: dict[Future[tuple[Path, int | None]], CogConversion] = {}
+        reserved: dict[Future, int] = {}
+        job_ids: dict[Future, int] = {}
+        try:
+            # Only start each conversion once there's memory for it
+            for job_id, conversion in enumerate(conversions):
+                input_tif_path = conversion.input_tif_paths[0]
+                for future in wait_for_memory(
+                    conversion_memory_bytes(input_tif_path),
+                    reserved=reserved,
+                    max_running=budget.workers,
+                    rss_bytes=lambda job: job_processes.rss_bytes(job_ids[job]),
+                ):
+                    del reserved[future]
+                    _finish_conversion(future, running.pop(future))
+
+                future = submit_cloud_optimize(
+                    executor,
+                    job_id=job_id,
+                    input_tif_path=input_tif_path,
+                    output_tif_path=to_path / input_tif_path.name,
+                    encoding=conversion.encoding,
+                )
+                running[future] = conversion
+                reserved[future] = conversion_memory_bytes(input_tif_path)
+                job_ids[future] = job_id
+
+            for future in as_completed(running):
+                _finish_conversion(future, running[future])
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+
+
+def _finish_conversion(
+    future: Future[tuple[Path, int | None]],
+    conversion: CogConversion,
+) -> None:
+    """Record a finished conversion, and cache its output."""
+    output_tif_path, peak_rss_bytes = future.result()
+    logger.info(
+        f'Created COG {output_tif_path}'
+        f' with profile {conversion.encoding.profile_name}'
+    )
+    if peak_rss_bytes is not None:
+        record_file_peak_rss(output_tif_path.name, peak_rss_bytes)
+
+    add_to_cache(conversion.cache_key, output_tif_path)
+    link_identical_outputs(
+        output_tif_path,
+        identical_input_tif_paths=conversion.input_tif_paths[1:],
+    )
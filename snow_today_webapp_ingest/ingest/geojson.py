@@ -1,9 +1,13 @@
 import json
 from pathlib import Path
 from pprint import pformat
+from typing import TextIO
 
 from loguru import logger
 
+from snow_today_webapp_ingest.util.error import UnexpectedInputError
+from snow_today_webapp_ingest.util.json_stream import STREAM_MIN_BYTES, JsonStream
+
 
 def fix_and_ingest_geojson(
     from_path: Path,  # A directory path; must exist.
@@ -37,20 +41,70 @@ def fix_and_ingest_geojson(
 
 def fix_and_write_geojson_file(input_file: Path, output_file: Path) -> None:
     """Read GeoJSON from `input_file`, fix errors, validate, and write `output_file."""
+    if input_file.stat().st_size >= STREAM_MIN_BYTES:
+        _stream_fix_and_write_geojson_file(input_file, output_file)
+        return
+
     input_geojson = json.loads(input_file.read_text())
 
     if isinstance(input_geojson['features'], list):
         output_geojson = input_geojson
     else:
-        logger.warning(
-            f"Input GeoJSON {input_file} contains a 'features' element that is not"
-            " a list. This matches a known pattern, attempting to fix..."
-        )
+        _warn_features_not_list(input_file)
         output_geojson = _fix(input_geojson)
 
     output_file.write_text(json.dumps(output_geojson))
 
 
+def _stream_fix_and_write_geojson_file(input_file: Path, output_file: Path) -> None:
+    """Like `fix_and_write_geojson_file`, but decode one feature at a time.
+
+    The output is the same, but memory use doesn't grow with the number of features.
+    """
+    has_features = False
+    with open(input_file) as src, open(output_file, "w") as dst:
+        stream = JsonStream(src)
+        dst.write("{")
+        for index, key in enumerate(stream.iter_object()):
+            dst.write(f"{', ' if index else ''}{json.dumps(key)}: ")
+            if key == "features":
+                has_features = True
+                _stream_features(stream, dst, input_file=input_file)
+            else:
+                value, _ = stream.read_value()
+                dst.write(json.dumps(value))
+        stream.end()
+        dst.write("}")
+
+    if not has_features:
+        raise UnexpectedInputError(f"Input GeoJSON {input_file} has no 'features'")
+
+
+def _stream_features(stream: JsonStream, dst: TextIO, *, input_file: Path) -> None:
+    if stream.peek() != "[":
+        _warn_features_not_list(input_file)
+        features, _ = stream.read_value()
+        dst.write(json.dumps(_fix({"features": features})["features"]))
+        return
+
+    dst.write("[")
+    for index in stream.iter_array():
+        feature, _ = stream.read_value()
+        if not isinstance(feature, dict):
+            raise UnexpectedInputError(
+                f"Input GeoJSON {input_file} feature {index} is not an object"
+            )
+        dst.write(f"{', ' if index else ''}{json.dumps(feature)}")
+    dst.write("]")
+
+
+def _warn_features_not_list(input_file: Path) -> None:
+    logger.warning(
+        f"Input GeoJSON {input_file} contains a 'features' element that is not"
+        " a list. This matches a known pattern, attempting to fix..."
+    )
+
+
 def _fix(input_geojson: dict) -> dict:
     """Fix a geojson file.
 
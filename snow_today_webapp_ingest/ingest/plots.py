@@ -0,0 +1,54 @@
+"""Validate and copy plot JSON files, and encode each as binary columns too.
+
+The JSON is kept for compatibility. The binary encoding (see `util.plot_binary`) is
+smaller, and browsers can read its columns without parsing them.
+"""
+
+import re
+from pathlib import Path
+
+from loguru import logger
+
+from snow_today_webapp_ingest.ingest.validate_and_copy_json import (
+    JsonModel,
+    validate_and_copy_json_matching_pattern,
+)
+from snow_today_webapp_ingest.types_.plot import PlotPayload
+from snow_today_webapp_ingest.util.plot_binary import PLOT_BINARY_SUFFIX, encode_plot
+
+
+def ingest_plots(
+    from_path: Path,
+    to_path: Path,
+    *,
+    model: JsonModel,
+    pattern: re.Pattern,
+) -> None:
+    validate_and_copy_json_matching_pattern(
+        from_path,
+        to_path,
+        model=model,
+        pattern=pattern,
+    )
+
+    json_bytes = binary_bytes = encoded_files = 0
+    for json_path in sorted(to_path.glob("*.json")):
+        # Already validated, but the model fills in the columns' exact types
+        data = json_path.read_bytes()
+        try:
+            encoded = encode_plot(PlotPayload.model_validate_json(data))
+        except ValueError as e:
+            # e.g. columns of different lengths, which the model doesn't forbid. The
+            # JSON is still published.
+            logger.warning(f"Not encoding {json_path.name} as binary: {e}")
+            continue
+
+        json_path.with_suffix(PLOT_BINARY_SUFFIX).write_bytes(encoded)
+        json_bytes += len(data)
+        binary_bytes += len(encoded)
+        encoded_files += 1
+
+    logger.info(
+        f"Encoded {encoded_files} plots as binary:"
+        f" {json_bytes / 1024**2:.1f}MB of JSON to {binary_bytes / 1024**2:.1f}MB"
+    )
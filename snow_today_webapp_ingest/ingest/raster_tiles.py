@@ -0,0 +1,156 @@
+"""Render colorized XYZ tile pyramids from super-region/variable GeoTIFFs.
+
+Clients can display these directly, instead of decoding COGs and applying colormaps
+themselves.
+"""
+
+import json
+from concurrent.futures import as_completed
+from contextlib import ExitStack
+from dataclasses import replace
+from itertools import batched
+from pathlib import Path
+
+from loguru import logger
+
+from snow_today_webapp_ingest.constants.paths import (
+    REPO_STATIC_COLORMAPS_INDEX_FP,
+    REPO_STATIC_SSP_VARIABLES_INDEX_FP,
+)
+from snow_today_webapp_ingest.ingest.cogs import cog_worker_budget
+from snow_today_webapp_ingest.report import record_metric
+from snow_today_webapp_ingest.types_.regions import SuperRegionsIndex
+from snow_today_webapp_ingest.types_.variables import SatelliteVariablesIndex
+from snow_today_webapp_ingest.util.pmtiles import PmtilesWriter
+from snow_today_webapp_ingest.util.tiles import (
+    TileFormat,
+    TileRenderJob,
+    native_zoom,
+    render_tiles,
+    tiles_covering,
+    web_mercator_extent,
+)
+
+# Zoomed further out than this, a super-region is only a few pixels across.
+MIN_TILE_ZOOM = 3
+# Don't render more detail than clients will ever ask for, whatever the resolution.
+MAX_TILE_ZOOM = 10
+# Tiles rendered by each job. Smaller jobs balance better between workers, but each job
+# opens its GeoTIFF again.
+TILES_PER_JOB = 64
+TILE_FORMAT: TileFormat = "PNG"
+
+
+def render_raster_tiles(
+    from_path: dict[str, Path],
+    to_path: Path,
+) -> None:
+    """Render a tile pyramid for each raster variable of each super-region.
+
+    Each pyramid is written to one PMTiles archive,
+    `{superRegionId}_{variableId}.pmtiles`. Pyramids with no data at all aren't written.
+    """
+    jobs_by_layer = plan_tile_render_jobs(
+        regions_index_path=from_path["regions"],
+        geotiffs_dir=from_path["geotiffs"],
+    )
+    n_jobs = sum(len(jobs) for jobs in jobs_by_layer.values())
+    if not n_jobs:
+        logger.warning("No raster tiles to render.")
+        record_metric("tilesRendered", 0)
+        return
+
+    budget = cog_worker_budget(n_jobs)
+    logger.info(f"Rendering tiles in {n_jobs} jobs with {budget.workers} workers.")
+    to_path.mkdir(parents=True, exist_ok=True)
+
+    tiles_rendered = 0
+    # Archives are finished after all workers have stopped, or deleted on error.
+    with ExitStack() as stack:
+        writers: dict[str, PmtilesWriter] = {}
+        executor = stack.enter_context(budget.executor())
+        layers_by_future = {
+            executor.submit(render_tiles, job): layer
+            for layer, jobs in jobs_by_layer.items()
+            for job in jobs
+        }
+        try:
+            for future in as_completed(layers_by_future):
+                # Drop our reference to the future, so its tiles can be freed
+                layer = layers_by_future.pop(future)
+                for (z, x, y), data in future.result():
+                    # Only once there's a tile: an archive can't be empty
+                    if layer not in writers:
+                        writers[layer] = stack.enter_context(
+                            _archive_writer(layer, to_path)
+                        )
+                    writers[layer].add_tile(z, x, y, data)
+                    tiles_rendered += 1
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+
+    record_metric("tilesRendered", tiles_rendered)
+    logger.info(f"Rendered {tiles_rendered} tiles to {len(writers)} archives.")
+
+
+def _archive_writer(layer: str, to_path: Path) -> PmtilesWriter:
+    return PmtilesWriter(
+        to_path / f"{layer}.pmtiles",
+        tile_type=TILE_FORMAT,
+        metadata={"name": layer, "format": TILE_FORMAT.lower(), "type": "overlay"},
+    )
+
+
+def plan_tile_render_jobs(
+    *,
+    regions_index_path: Path,
+    geotiffs_dir: Path,
+) -> dict[str, list[TileRenderJob]]:
+    """Split every tile of every super-region/variable pyramid into render jobs."""
+    regions_index = SuperRegionsIndex.model_validate_json(
+        regions_index_path.read_bytes(),
+    )
+    variables_index = SatelliteVariablesIndex.model_validate_json(
+        REPO_STATIC_SSP_VARIABLES_INDEX_FP.read_bytes(),
+    )
+    colormaps_json: dict[str, dict] = json.loads(
+        REPO_STATIC_COLORMAPS_INDEX_FP.read_text()
+    )
+
+    jobs_by_layer: dict[str, list[TileRenderJob]] = {}
+    for region_id, region in regions_index.root.items():
+        for variable_id, region_variable in region.variables.items():
+            variable = variables_index.root[str(variable_id)]
+            # Skip variable 77 (days_without_observation) - removed, like its legend
+            if str(variable_id) == '77' or variable.layer_type != "raster":
+                continue
+
+            colormap = colormaps_json[str(variable.colormap_id)]
+            jobs_by_layer[f"{region_id}_{variable_id}"] = _pyramid_jobs(
+                TileRenderJob(
+                    source_path=(
+                        geotiffs_dir / region_variable.geotiff_relative_path.name
+                    ),
+                    tiles=[],
+                    colors=[tuple(color) for color in colormap["colors"]],
+                    value_range=region_variable.data_value_range,
+                    no_data_value=variable.no_data_value,
+                    transparent_zero=variable.transparent_zero,
+                    file_format=TILE_FORMAT,
+                )
+            )
+
+    return jobs_by_layer
+
+
+def _pyramid_jobs(template: TileRenderJob) -> list[TileRenderJob]:
+    """Split the whole pyramid of `template`'s source into jobs like `template`."""
+    bounds, resolution = web_mercator_extent(template.source_path)
+    max_zoom = max(min(native_zoom(resolution), MAX_TILE_ZOOM), MIN_TILE_ZOOM)
+
+    return [
+        replace(template, tiles=list(tiles))
+        for zoom in range(MIN_TILE_ZOOM, max_zoom + 1)
+        for tiles in batched(tiles_covering(bounds, zoom=zoom), TILES_PER_JOB)
+    ]
@@ -1,44 +1,213 @@
+import copy
+import inspect
 import json
+import math
+import multiprocessing
 import re
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import cache, partial
+from itertools import batched
 from pathlib import Path
 from pprint import pformat
+from typing import Any, get_origin
 
-from jsonschema import validate
+import pydantic_core
+from jsonschema import ValidationError as JsonSchemaValidationError
+from jsonschema.validators import validator_for
 from loguru import logger
+from pydantic import TypeAdapter
+from pydantic_core import SchemaValidator
 
+from snow_today_webapp_ingest.settings import configure_ingest, ingest_settings
 from snow_today_webapp_ingest.types_.base import BaseModel, RootModel
+from snow_today_webapp_ingest.types_.subregion_hierarchy import SubRegionsHierarchy
+from snow_today_webapp_ingest.util.error import InvalidJsonError
+from snow_today_webapp_ingest.util.fs import copy_file, link_or_copy_file
+from snow_today_webapp_ingest.util.json_stream import STREAM_MIN_BYTES, JsonStream
+from snow_today_webapp_ingest.util.resources import available_cpus
+
+JsonModel = type[BaseModel] | type[RootModel]
+JsonValidator = Callable[[bytes | str], object]
+
+# Fewest files sent to a validation worker at a time. Validating this many takes about
+# as long as starting a worker, so fewer files are validated in-process.
+VALIDATE_MIN_CHUNK_FILES = 500
+
+# Models validated against their JSON schema instead of by Pydantic. The recursive
+# hierarchy model is stricter than its JSON schema, which is what we publish and what
+# producers are held to.
+SCHEMA_VALIDATED_MODELS: frozenset[JsonModel] = frozenset({SubRegionsHierarchy})
+
+
+@cache
+def json_schema(model: JsonModel) -> dict:
+    """Generate the JSON schema for `model` once, instead of for every file."""
+    return model.model_json_schema()
+
+
+@cache
+def json_validator(model: JsonModel) -> JsonValidator:
+    """Build a validator for JSON documents (bytes) against `model`, once per model.
+
+    Pydantic's compiled validator parses and validates in one pass. It's strict, so
+    values aren't coerced to a field's type where the JSON schema would reject them, and
+    only accepts keys by alias, as the JSON schema does.
+    """
+    if model in SCHEMA_VALIDATED_MODELS:
+        schema = json_schema(model)
+        validator_cls = validator_for(schema)
+        validator_cls.check_schema(schema)
+        validator = validator_cls(schema)
+        return lambda data: validator.validate(json.loads(data))
+
+    return _alias_only_validator(model)
+
+
+@cache
+def json_entries_validator(model: JsonModel) -> JsonValidator | None:
+    """Build a validator for entries of `model`, if it's a JSON object, e.g. an index.
+
+    Large files of these models are validated an entry at a time.
+    """
+    if model in SCHEMA_VALIDATED_MODELS or not issubclass(model, RootModel):
+        return None
+    root_type = model.model_fields["root"].annotation
+    if root_type is None or get_origin(root_type) is not dict:
+        return None
+    return _alias_only_validator(root_type)
+
+
+def _alias_only_validator(type_: Any) -> JsonValidator:
+    """Build a strict validator for `type_` which rejects keys by field name.
+
+    Our models also accept field names (e.g. `min_year` for `minYear`) so they can be
+    constructed in Python, but inputs must use the names in the JSON schema.
+    """
+    schema = copy.deepcopy(TypeAdapter(type_).core_schema)
+    if not _disable_validation_by_name(schema):
+        raise RuntimeError(f"Programmer error: no model config found for {type_}")
+    validator = SchemaValidator(schema)
+
+    # Since Pydantic 2.11, the config in the schema is overridden at validation time
+    if "by_name" in inspect.signature(validator.validate_json).parameters:
+        return partial(validator.validate_json, strict=True, by_name=False)
+    return partial(validator.validate_json, strict=True)
+
+
+def _disable_validation_by_name(schema: Any) -> bool:
+    """Turn off validation by field name in every model config in a core schema.
+
+    Returns whether any config was found. The setting is `validate_by_name` since
+    Pydantic 2.11, and `populate_by_name` before that.
+    """
+    found = False
+    pending = [schema]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, dict):
+            config = node.get("config")
+            for key in ("validate_by_name", "populate_by_name"):
+                if isinstance(config, dict) and key in config:
+                    config[key] = False
+                    found = True
+            pending.extend(node.values())
+    return found
+
+
+def matching_files(from_path: Path, pattern: re.Pattern) -> list[Path]:
+    """List files in directory `from_path` with names matching `pattern`."""
+    return [f for f in from_path.glob("*") if pattern.match(f.name)]
 
 
 def validate_and_copy_json(
     from_path: Path,  # A file path; exists.
     to_path: Path,  # A file path; doesn't exist yet.
     *,
-    model: type[BaseModel] | type[RootModel],
+    model: JsonModel,
 ) -> None:
     """Validate `from_path` file against `model`, then copy to `to_path`."""
     logger.debug(f"Copying {from_path} -> {to_path}...")
+    to_path.parent.mkdir(parents=True, exist_ok=True)
+    _validate_and_copy(from_path, to_path, model=model)
+    logger.info(f"Validated: {from_path.name}")
+    logger.debug(f"Created: {to_path}")
 
-    source_json = json.loads(from_path.read_text())
-    schema_json = model.model_json_schema()
 
-    validate(schema=schema_json, instance=source_json)
-    logger.info(f"Validated: {from_path.name}")
+def _validate_and_copy(from_path: Path, to_path: Path, *, model: JsonModel) -> None:
+    entries_validator = json_entries_validator(model)
+    if entries_validator is not None and from_path.stat().st_size >= STREAM_MIN_BYTES:
+        _stream_validate_and_copy(
+            from_path,
+            to_path,
+            entries_validator=entries_validator,
+        )
+        return
 
-    to_path.parent.mkdir(parents=True, exist_ok=True)
-    to_path.write_text(json.dumps(source_json))
-    logger.debug(f"Created: {to_path}")
+    source_bytes = from_path.read_bytes()
+    json_validator(model)(source_bytes)
+    if ingest_settings().json_publish_mode == "minify":
+        to_path.write_bytes(
+            pydantic_core.to_json(pydantic_core.from_json(source_bytes))
+        )
+    else:
+        _copy_json(from_path, to_path)
+
+
+def _copy_json(from_path: Path, to_path: Path) -> None:
+    """Publish `from_path` unchanged."""
+    if ingest_settings().json_publish_mode == "hardlink":
+        link_or_copy_file(from_path, to_path)
+    else:
+        copy_file(from_path, to_path)
+
+
+def _stream_validate_and_copy(
+    from_path: Path,
+    to_path: Path,
+    *,
+    entries_validator: JsonValidator,
+) -> None:
+    """Validate and publish a large JSON object, decoding one entry at a time."""
+    minify = ingest_settings().json_publish_mode == "minify"
+    with ExitStack() as stack:
+        stream = JsonStream(stack.enter_context(open(from_path)))
+        minified = stack.enter_context(open(to_path, "xb")) if minify else None
+
+        if minified is not None:
+            minified.write(b"{")
+        for index, key in enumerate(stream.iter_object()):
+            value, text = stream.read_value()
+            entries_validator(f"{{{json.dumps(key)}:{text}}}")
+            if minified is not None:
+                minified.write(b"," if index else b"")
+                minified.write(pydantic_core.to_json(key) + b":")
+                minified.write(pydantic_core.to_json(value))
+        stream.end()
+        if minified is not None:
+            minified.write(b"}")
+
+    if not minify:
+        _copy_json(from_path, to_path)
 
 
 def validate_and_copy_json_matching_pattern(
     from_path: Path,  # A directory path; must exist.
     to_path: Path,  # A directory path; may or may not exist yet.
     *,
-    model: type[BaseModel] | type[RootModel],
+    model: JsonModel,
     pattern: re.Pattern,
 ) -> None:
-    """Validate and copy files matching `pattern` from `from_path` to `to_path`."""
-    all_files = from_path.glob("*")
-    input_files = [f for f in all_files if pattern.match(f.name)]
+    """Validate and copy files matching `pattern` from `from_path` to `to_path`.
+
+    Files are split into a chunk per worker (but at least `VALIDATE_MIN_CHUNK_FILES`
+    each), and validated in parallel. Every file is checked before raising
+    `InvalidJsonError` for all the invalid ones.
+    """
+    input_files = sorted(matching_files(from_path, pattern))
 
     if len(input_files) == 0:
         msg = f'Aborting: no files found at {from_path=} matching {pattern=}'
@@ -49,8 +218,107 @@ def validate_and_copy_json_matching_pattern(
     logger.debug(f'Validating and copying:\n{input_files_pretty}...')
 
     to_path.mkdir(parents=True, exist_ok=True)
-    for file in input_files:
-        to_filepath = to_path / file.name
-        validate_and_copy_json(file, to_filepath, model=model)
+    chunk_files = max(
+        VALIDATE_MIN_CHUNK_FILES,
+        math.ceil(len(input_files) / _validate_workers()),
+    )
+    chunks = list(batched(input_files, chunk_files))
+    errors = _validate_and_copy_chunks(chunks, to_path, model=model)
+
+    # Log in file name order, however the chunks were scheduled
+    invalid_files: list[str] = []
+    for file_name, error in errors:
+        if error is None:
+            logger.info(f"Validated: {file_name}")
+        else:
+            logger.error(f"Invalid: {file_name}: {error}")
+            invalid_files.append(file_name)
+
+    if invalid_files:
+        raise InvalidJsonError(
+            f"{len(invalid_files)} of {len(input_files)} files in {from_path} failed"
+            f" validation: {invalid_files}"
+        )
+    logger.debug(f'Successfully validated and copied {len(input_files)} files')
+
+
+def _validate_and_copy_chunks(
+    chunks: list[tuple[Path, ...]],
+    to_path: Path,
+    *,
+    model: JsonModel,
+) -> list[tuple[str, str | None]]:
+    """Validate and copy each chunk of files, in worker processes if there are many.
+
+    Returns each file's name and error message (None if it's valid), in order.
+    """
+    workers = min(_validate_workers(), len(chunks))
+    if workers <= 1:
+        return [
+            error
+            for chunk in chunks
+            for error in _validate_and_copy_chunk(chunk, to_path, model=model)
+        ]
+
+    logger.info(f"Validating {len(chunks)} chunks of files with {workers} workers")
+    model_origin, model_args = _model_reference(model)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=configure_ingest,
+        initargs=(ingest_settings(),),
+    ) as executor:
+        futures = [
+            executor.submit(
+                _validate_and_copy_chunk_in_worker,
+                chunk,
+                to_path,
+                model_origin=model_origin,
+                model_args=model_args,
+            )
+            for chunk in chunks
+        ]
+        return [error for future in futures for error in future.result()]
+
+
+def _validate_workers() -> int:
+    return ingest_settings().validate_workers or available_cpus()
+
+
+def _model_reference(model: JsonModel) -> tuple[JsonModel, tuple[type, ...]]:
+    """Split a model into its generic origin and arguments, for sending to workers.
 
-    logger.debug('Successfully validated and copied {len(input_files)} files')
+    Parametrized generic models, e.g. `PlotPayload`, can't be pickled.
+    """
+    generic_metadata = model.__pydantic_generic_metadata__
+    if generic_metadata["origin"] is None:
+        return model, ()
+    return generic_metadata["origin"], generic_metadata["args"]
+
+
+def _validate_and_copy_chunk_in_worker(
+    chunk: tuple[Path, ...],
+    to_path: Path,
+    *,
+    model_origin: JsonModel,
+    model_args: tuple[type, ...],
+) -> list[tuple[str, str | None]]:
+    model = model_origin[model_args] if model_args else model_origin  # type: ignore[index]
+    return _validate_and_copy_chunk(chunk, to_path, model=model)
+
+
+def _validate_and_copy_chunk(
+    chunk: tuple[Path, ...],
+    to_path: Path,
+    *,
+    model: JsonModel,
+) -> list[tuple[str, str | None]]:
+    errors: list[tuple[str, str | None]] = []
+    for file in chunk:
+        try:
+            _validate_and_copy(file, to_path / file.name, model=model)
+        except (OSError, ValueError, JsonSchemaValidationError) as e:
+            errors.append((file.name, str(e)))
+        else:
+            errors.append((file.name, None))
+    return errors
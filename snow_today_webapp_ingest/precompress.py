@@ -0,0 +1,164 @@
+"""Write precompressed copies of text outputs, for the web server to send as-is.
+
+nginx's `gzip_static` serves `{file}.gz` in place of `{file}` to clients which accept
+gzip, so each output is compressed once per ingest, at the highest level, instead of on
+every request. Brotli (`{file}.br`, served by the separate `ngx_brotli` module's
+`brotli_static`) is optional, and needs the `brotli` package.
+"""
+
+import gzip
+import importlib.util
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from snow_today_webapp_ingest.util.resources import available_cpus
+
+# Binary plots too: gzip shrinks their date and day columns, and NaN runs
+PRECOMPRESS_SUFFIXES = frozenset({".json", ".geojson", ".svg", ".bin"})
+# Smaller files fit in a packet either way
+PRECOMPRESS_MIN_BYTES = 1024
+GZIP_SUFFIX = ".gz"
+BROTLI_SUFFIX = ".br"
+
+
+@dataclass(frozen=True)
+class _Precompressed:
+    original_bytes: int
+    compressed_bytes: int
+    reused: bool
+
+
+def brotli_available() -> bool:
+    return importlib.util.find_spec("brotli") is not None
+
+
+def precompress_outputs(
+    output_dir: Path,
+    *,
+    live_dir: Path,
+    brotli: bool,
+) -> None:
+    """Write a compressed sibling of each compressible file in `output_dir`.
+
+    Files hardlinked from `live_dir` (e.g. reused by an incremental ingest) reuse their
+    live siblings, too. Compression runs in threads: zlib and brotli release the GIL.
+    """
+    start = time.perf_counter()
+    suffixes = [GZIP_SUFFIX, BROTLI_SUFFIX] if brotli else [GZIP_SUFFIX]
+    files = _compressible_files(output_dir)
+
+    with ThreadPoolExecutor(
+        max_workers=available_cpus(),
+        thread_name_prefix="precompress",
+    ) as executor:
+        results = list(
+            executor.map(
+                lambda path: _precompress(
+                    path,
+                    live_path=live_dir / path.relative_to(output_dir),
+                    suffixes=suffixes,
+                ),
+                files,
+            )
+        )
+
+    original_bytes = sum(r.original_bytes for r in results)
+    compressed_bytes = sum(r.compressed_bytes for r in results)
+    reused = sum(r.reused for r in results)
+    logger.success(
+        f"🗜️ Precompressed {len(files)} files ({', '.join(suffixes)}; {reused} reused"
+        f" from live) in {time.perf_counter() - start:.1f}s:"
+        f" {original_bytes / 1024**2:.1f}MB to {compressed_bytes / 1024**2:.1f}MB"
+    )
+
+
+def _compressible_files(output_dir: Path) -> list[Path]:
+    return sorted(
+        path
+        for dirpath, _, filenames in os.walk(output_dir)
+        for filename in filenames
+        if (path := Path(dirpath) / filename).suffix in PRECOMPRESS_SUFFIXES
+        and path.stat().st_size >= PRECOMPRESS_MIN_BYTES
+    )
+
+
+def _precompress(path: Path, *, live_path: Path, suffixes: list[str]) -> _Precompressed:
+    """Write `path`'s compressed siblings, or link them from `live_path` if unchanged.
+
+    A live sibling is only reused if it was written after the original was last
+    modified: a hardlinked original (e.g. with `--json-publish-mode hardlink`) may have
+    been rewritten in place since. A sibling which isn't smaller than the original isn't
+    written, so it's never served.
+    """
+    stat = path.stat()
+    original_bytes = stat.st_size
+    unchanged = _is_same_file(path, live_path)
+    data: bytes | None = None
+    compressed_bytes = 0
+    reused = True
+
+    for suffix in suffixes:
+        sibling = _sibling(path, suffix)
+        live_sibling = _sibling(live_path, suffix)
+        if not (
+            unchanged
+            and _modified_since(live_sibling, stat.st_mtime_ns)
+            and _link(live_sibling, sibling)
+        ):
+            reused = False
+            data = path.read_bytes() if data is None else data
+            compressed = _compress(data, suffix=suffix)
+            if len(compressed) >= original_bytes:
+                continue
+            sibling.write_bytes(compressed)
+        compressed_bytes += sibling.stat().st_size
+
+    return _Precompressed(
+        original_bytes=original_bytes,
+        compressed_bytes=compressed_bytes,
+        reused=reused,
+    )
+
+
+def _compress(data: bytes, *, suffix: str) -> bytes:
+    if suffix == GZIP_SUFFIX:
+        # mtime=0: the same input always compresses to the same bytes
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    elif suffix == BROTLI_SUFFIX:
+        import brotli
+
+        return brotli.compress(data, quality=11)
+    else:
+        raise RuntimeError(f"Programmer error: unknown suffix {suffix}")
+
+
+def _is_same_file(path: Path, other: Path) -> bool:
+    try:
+        return os.path.samefile(path, other)
+    except OSError:
+        return False
+
+
+def _modified_since(path: Path, mtime_ns: int) -> bool:
+    try:
+        return path.stat().st_mtime_ns >= mtime_ns
+    except OSError:
+        return False
+
+
+def _link(from_path: Path, to_path: Path) -> bool:
+    try:
+        os.link(from_path, to_path)
+    except OSError:
+        # e.g. the live version was published before precompression, or without brotli
+        return False
+    return True
+
+
+def _sibling(path: Path, suffix: str) -> Path:
+    return path.with_name(path.name + suffix)
@@ -0,0 +1,159 @@
+"""Publish ingest outputs to the live location without downtime.
+
+Each successful ingest becomes an immutable version directory. The live path for a data
+source is a symlink to the current version, which is atomically replaced when a new
+version is published, so the web server never sees a missing or partial directory.
+
+Replaced versions are deleted after a grace period, so that browser sessions which
+started before the switch can finish loading data from the version they started with.
+"""
+
+import datetime as dt
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from snow_today_webapp_ingest.constants.paths import (
+    OUTPUT_BKP_DIR,
+    OUTPUT_LIVE_VERSIONS_DIR,
+)
+from snow_today_webapp_ingest.types_.data_sources import DataSource
+
+# The web server sets `Cache-Control: max-age=900`; be generous.
+LIVE_VERSION_GRACE_PERIOD = dt.timedelta(hours=1)
+RETIRED_MARKER_SUFFIX = ".retired"
+
+
+def publish(
+    ingest_tmpdir: Path,
+    *,
+    live_dir: Path,
+    source: DataSource,
+    keep_backup: bool,
+) -> Path:
+    """Make `ingest_tmpdir` the live data for `source` and return its version dir.
+
+    Versions which were retired more than `LIVE_VERSION_GRACE_PERIOD` ago are deleted in
+    a background thread.
+    """
+    versions_dir = OUTPUT_LIVE_VERSIONS_DIR / source
+    versions_dir.mkdir(parents=True, exist_ok=True)
+
+    version_dir = versions_dir / ingest_tmpdir.name
+    ingest_tmpdir.rename(version_dir)
+
+    previous_version_dir = _current_version(live_dir, versions_dir=versions_dir)
+    _replace_symlink(live_dir, target=version_dir)
+    logger.info(f"Switched '{live_dir}' to version '{version_dir.name}'.")
+
+    if previous_version_dir is not None:
+        if keep_backup:
+            bkp_dir = _unique_backup_dir(OUTPUT_BKP_DIR / source)
+            _link_tree(previous_version_dir, bkp_dir)
+            logger.info(f"Backed up '{previous_version_dir}' to '{bkp_dir}'.")
+
+        _retire(previous_version_dir)
+
+    threading.Thread(
+        target=prune_versions,
+        kwargs={"versions_dir": versions_dir, "keep": version_dir},
+        name=f"prune-{source}",
+    ).start()
+
+    return version_dir
+
+
+def prune_versions(
+    *,
+    versions_dir: Path,
+    keep: Path,
+    grace_period: dt.timedelta = LIVE_VERSION_GRACE_PERIOD,
+) -> None:
+    """Delete versions in `versions_dir` retired more than `grace_period` ago."""
+    for marker in versions_dir.glob(f"*{RETIRED_MARKER_SUFFIX}"):
+        version_dir = marker.with_suffix("")
+        if version_dir == keep:
+            # A retired version could be re-published by a manual rollback.
+            marker.unlink(missing_ok=True)
+            continue
+
+        retired_seconds_ago = time.time() - marker.stat().st_mtime
+        if retired_seconds_ago < grace_period.total_seconds():
+            continue
+
+        try:
+            shutil.rmtree(version_dir)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to delete retired version '{version_dir}': {e}")
+            continue
+
+        marker.unlink(missing_ok=True)
+        logger.info(f"Deleted retired version '{version_dir}'.")
+
+
+def _current_version(live_dir: Path, *, versions_dir: Path) -> Path | None:
+    """Return the version directory currently published at `live_dir`, if any.
+
+    Live directories written by older versions of this program are real directories,
+    not symlinks. Those are migrated to a version directory first.
+    """
+    if live_dir.is_symlink():
+        return live_dir.resolve()
+
+    if live_dir.is_dir():
+        legacy_version_dir = versions_dir / f"legacy_{dt.date.today()}"
+        live_dir.rename(legacy_version_dir)
+        logger.warning(f"Migrated legacy live dir to '{legacy_version_dir}'.")
+        return legacy_version_dir
+
+    live_dir.parent.mkdir(parents=True, exist_ok=True)
+    return None
+
+
+def _replace_symlink(link: Path, *, target: Path) -> None:
+    """Atomically point `link` at `target`, replacing whatever `link` was before.
+
+    The link is relative, so it still works where the live dir is mounted elsewhere
+    (e.g. in the web server's container).
+    """
+    tmp_link = link.with_name(f".{link.name}.new")
+    tmp_link.unlink(missing_ok=True)
+    tmp_link.symlink_to(os.path.relpath(target, link.parent))
+    os.replace(tmp_link, link)
+
+
+def _retire(version_dir: Path) -> None:
+    """Mark `version_dir` for deletion once its grace period has passed."""
+    version_dir.with_name(version_dir.name + RETIRED_MARKER_SUFFIX).touch()
+
+
+def _link_tree(from_dir: Path, to_dir: Path) -> None:
+    """Copy `from_dir` to `to_dir` by hardlinking every file.
+
+    This is cheap, and safe because published versions are never modified.
+    """
+    to_dir.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copytree(from_dir, to_dir, copy_function=os.link)
+
+
+def _unique_backup_dir(parent: Path) -> Path:
+    """Generate a backup directory path that doesn't conflict.
+
+    In case multiple runs are taken in a single day, we don't want the program to fail
+    creating a backup dir.
+    """
+    dirname = f"bkp-{dt.date.today()}"
+    path = parent / dirname
+
+    counter = 1
+    while path.is_dir():
+        path = parent / f"{dirname}_{counter}"
+        counter = counter + 1
+
+    return path
@@ -0,0 +1,203 @@
+"""Check that ingest outputs only reference files and identifiers which exist.
+
+Outputs refer to each other by relative path (e.g. each super-region variable's COG and
+legend) and by identifier (e.g. plots are named by region and variable ID). A dangling
+reference isn't otherwise noticed until a user's browser gets a 404.
+
+Each output is read once, to index which files, regions, variables and collections
+exist, so every reference is checked by a set lookup.
+"""
+
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from snow_today_webapp_ingest.constants.paths import (
+    INCOMING_REGIONS_COLLECTIONS_JSON,
+    INCOMING_REGIONS_ROOT_JSON,
+    OUTPUT_PLOTS_SUBDIR,
+    OUTPUT_REGIONS_SUBDIR,
+    REPO_STATIC_SSP_VARIABLES_INDEX_FP,
+)
+from snow_today_webapp_ingest.types_.regions import (
+    SubRegionsIndex,
+    SuperRegion,
+    SuperRegionsIndex,
+)
+from snow_today_webapp_ingest.util.error import DanglingReferenceError
+
+_PLOT_FILENAME = re.compile(r"^(?P<region_id>\d+)_(?P<variable_id>\d+)\.(json|bin)$")
+
+
+def check_references(output_dir: Path, *, strict: bool) -> None:
+    """Log references in `output_dir` to files or IDs which don't exist.
+
+    If `strict`, raise DanglingReferenceError if there are any.
+    """
+    start = time.perf_counter()
+    problems = find_dangling_references(output_dir)
+    elapsed = time.perf_counter() - start
+
+    if not problems:
+        logger.success(f"✅ No dangling references in '{output_dir}' ({elapsed:.3f}s)")
+        return
+
+    log = logger.error if strict else logger.warning
+    for problem in problems:
+        log(f"Dangling reference: {problem}")
+
+    msg = f"{len(problems)} dangling references in '{output_dir}' ({elapsed:.3f}s)"
+    if strict:
+        raise DanglingReferenceError(msg)
+    logger.warning(msg)
+
+
+def find_dangling_references(output_dir: Path) -> list[str]:
+    """Describe each reference in `output_dir` to a file or ID which doesn't exist.
+
+    Only snow-surface-properties outputs contain references; for other data sources,
+    there's nothing to check.
+    """
+    super_regions_fp = (
+        output_dir / OUTPUT_REGIONS_SUBDIR / INCOMING_REGIONS_ROOT_JSON.name
+    )
+    if not super_regions_fp.is_file():
+        return []
+
+    checker = _ReferenceChecker(output_dir)
+    super_regions = SuperRegionsIndex.model_validate_json(super_regions_fp.read_bytes())
+    region_ids = set(super_regions.root)
+    for super_region_id, super_region in super_regions.root.items():
+        region_ids |= checker.check_super_region(super_region_id, super_region)
+    checker.check_plots(region_ids)
+    return checker.problems()
+
+
+class _ReferenceChecker:
+    def __init__(self, output_dir: Path) -> None:
+        self.output_dir = output_dir
+        self.files = _list_files(output_dir)
+        self.variable_ids = set(
+            _read_json(output_dir / REPO_STATIC_SSP_VARIABLES_INDEX_FP.name)
+        )
+        self.collection_ids = set(
+            _read_json(
+                output_dir
+                / OUTPUT_REGIONS_SUBDIR
+                / INCOMING_REGIONS_COLLECTIONS_JSON.name
+            )
+        )
+        # Relative path of each referenced file, and where it's referenced from
+        self.referenced_files: dict[str, str] = {}
+        self._problems: list[str] = []
+
+    def problems(self) -> list[str]:
+        missing_files = self.referenced_files.keys() - self.files
+        return self._problems + [
+            f"{self.referenced_files[path]} references missing file '{path}'"
+            for path in sorted(missing_files)
+        ]
+
+    def check_super_region(
+        self,
+        super_region_id: str,
+        super_region: SuperRegion,
+    ) -> set[str]:
+        """Check a super-region's references. Return its sub-regions' IDs."""
+        where = f"Super-region {super_region_id}"
+        self._reference_file(super_region.shape_relative_path, where=where)
+        for variable_id, variable in super_region.variables.items():
+            variable_where = f"{where} variable {variable_id}"
+            if variable_id not in self.variable_ids:
+                self._problems.append(f"{variable_where} is not in the variables index")
+            self._reference_file(variable.geotiff_relative_path, where=variable_where)
+            self._reference_file(variable.legend_relative_path, where=variable_where)
+
+        sub_regions_fp = self._reference_file(
+            super_region.sub_regions_relative_path,
+            where=where,
+        )
+        hierarchy_fp = self._reference_file(
+            super_region.sub_regions_hierarchy_relative_path,
+            where=where,
+        )
+        if sub_regions_fp is None:
+            return set()
+
+        sub_regions = SubRegionsIndex.model_validate_json(sub_regions_fp.read_bytes())
+        for sub_region_id, sub_region in sub_regions.root.items():
+            self._reference_file(
+                sub_region.shape_relative_path,
+                where=f"Sub-region {sub_region_id}",
+            )
+
+        if hierarchy_fp is not None:
+            self._check_hierarchy(hierarchy_fp, sub_region_ids=set(sub_regions.root))
+        return set(sub_regions.root)
+
+    def check_plots(self, region_ids: set[str]) -> None:
+        """Check that each plot is for a known region and variable."""
+        plots_prefix = f"{OUTPUT_PLOTS_SUBDIR.as_posix()}/"
+        for path in sorted(self.files):
+            if not path.startswith(plots_prefix):
+                continue
+            match = _PLOT_FILENAME.match(path.removeprefix(plots_prefix))
+            if match is None:
+                continue
+            if match["region_id"] not in region_ids:
+                self._problems.append(f"Plot '{path}' is for an unknown region")
+            if match["variable_id"] not in self.variable_ids:
+                self._problems.append(f"Plot '{path}' is for an unknown variable")
+
+    def _check_hierarchy(self, hierarchy_fp: Path, *, sub_region_ids: set[str]) -> None:
+        collection_ids, region_ids = _hierarchy_ids(_read_json(hierarchy_fp))
+        where = f"Hierarchy '{hierarchy_fp.relative_to(self.output_dir)}'"
+        self._problems += [
+            f"{where} references unknown collection {collection_id}"
+            for collection_id in sorted(collection_ids - self.collection_ids)
+        ]
+        self._problems += [
+            f"{where} references unknown sub-region {region_id}"
+            for region_id in sorted(region_ids - sub_region_ids)
+        ]
+
+    def _reference_file(self, relative_path: Path, *, where: str) -> Path | None:
+        """Record a reference to a file. Return its path, if it exists."""
+        key = relative_path.as_posix()
+        self.referenced_files.setdefault(key, where)
+        return self.output_dir / relative_path if key in self.files else None
+
+
+def _hierarchy_ids(hierarchy: dict) -> tuple[set[str], set[str]]:
+    """Collect the collection and region IDs in a hierarchy, at every depth.
+
+    Read as plain JSON: the hierarchy model is stricter than the schema producers are
+    held to (see `SCHEMA_VALIDATED_MODELS`).
+    """
+    collection_ids: set[str] = set()
+    region_ids: set[str] = set()
+    pending = [hierarchy.get("collections") or {}]
+    while pending:
+        for collection_id, collection in pending.pop().items():
+            collection_ids.add(collection_id)
+            for region_id, region in (collection.get("regions") or {}).items():
+                region_ids.add(region_id)
+                pending.append(region.get("collections") or {})
+    return collection_ids, region_ids
+
+
+def _list_files(output_dir: Path) -> set[str]:
+    """List every file in `output_dir`, as POSIX paths relative to it."""
+    return {
+        Path(dirpath, filename).relative_to(output_dir).as_posix()
+        for dirpath, _, filenames in os.walk(output_dir)
+        for filename in filenames
+    }
+
+
+def _read_json(path: Path) -> dict:
+    return json.loads(path.read_text()) if path.is_file() else {}
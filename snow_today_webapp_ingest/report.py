@@ -0,0 +1,206 @@
+"""Measure the resources used by an ingest run and write a machine-readable report.
+
+The report is written to `run-report.json` in the root of the ingest output, so it goes
+live along with the data it describes.
+"""
+
+import datetime as dt
+import os
+import resource
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from loguru import logger
+
+from snow_today_webapp_ingest.constants.paths import OUTPUT_RUN_REPORT_FILE
+from snow_today_webapp_ingest.data_classes import (
+    OutputDataClass,
+    OutputDataClassName,
+)
+from snow_today_webapp_ingest.types_.data_sources import DataSource
+from snow_today_webapp_ingest.types_.manifest import IngestManifestEntry
+from snow_today_webapp_ingest.types_.run_report import (
+    MetricValue,
+    ResourceUsage,
+    RunReport,
+    TaskReport,
+)
+
+# ru_maxrss is reported in kilobytes on Linux, but bytes on MacOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+_task_metrics: ContextVar[dict[str, MetricValue] | None] = ContextVar(
+    "_task_metrics",
+    default=None,
+)
+
+
+_task_file_peak_rss: ContextVar[dict[str, int] | None] = ContextVar(
+    "_task_file_peak_rss",
+    default=None,
+)
+
+
+def record_metric(name: str, value: MetricValue) -> None:
+    """Record a task-specific measurement in the report for the current task.
+
+    Must be called from the thread running the task. Does nothing outside of a task,
+    e.g. when ingest functions are called directly.
+    """
+    metrics = _task_metrics.get()
+    if metrics is not None:
+        metrics[name] = value
+
+
+def record_file_peak_rss(file_name: str, peak_rss_bytes: int) -> None:
+    """Record the peak memory used to process a file in the report for the current task.
+
+    Like `record_metric`, must be called from the thread running the task.
+    """
+    peak_rss = _task_file_peak_rss.get()
+    if peak_rss is not None:
+        peak_rss[file_name] = peak_rss_bytes
+
+
+class RunReporter:
+    """Collect reports on ingest tasks as they complete."""
+
+    def __init__(self, *, data_source: DataSource, jobs: int) -> None:
+        self.data_source = data_source
+        self.jobs = jobs
+        self.started_at = dt.datetime.now().astimezone()
+
+        self._start_wall_time = time.perf_counter()
+        self._start_self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        self._start_children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self._tasks: dict[OutputDataClassName, TaskReport] = {}
+        self._lock = threading.Lock()
+
+    def instrument(
+        self,
+        run_task: Callable[[OutputDataClassName, OutputDataClass], IngestManifestEntry],
+        *,
+        ingest_tmpdir: Path,
+    ) -> Callable[[OutputDataClassName, OutputDataClass], IngestManifestEntry]:
+        """Wrap `run_task` so that a report is recorded each time it's called."""
+
+        def _run_task(
+            name: OutputDataClassName,
+            data_class: OutputDataClass,
+        ) -> IngestManifestEntry:
+            with self._measure(name, data_class) as outputs:
+                entry = run_task(name, data_class)
+                outputs.extend(ingest_tmpdir / output for output in entry.outputs)
+            return entry
+
+        return _run_task
+
+    @contextmanager
+    def _measure(
+        self,
+        name: OutputDataClassName,
+        data_class: OutputDataClass,
+    ) -> Iterator[list[Path]]:
+        metrics: dict[str, MetricValue] = {}
+        metrics_token = _task_metrics.set(metrics)
+        file_peak_rss: dict[str, int] = {}
+        file_peak_rss_token = _task_file_peak_rss.set(file_peak_rss)
+        outputs: list[Path] = []
+        succeeded = False
+
+        start_wall_time = time.perf_counter()
+        start_cpu_time = time.thread_time()
+        start_children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        try:
+            yield outputs
+            succeeded = True
+        finally:
+            _task_metrics.reset(metrics_token)
+            _task_file_peak_rss.reset(file_peak_rss_token)
+            children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            input_files = _files(data_class.ingest_task.from_path)
+
+            report = TaskReport(
+                succeeded=succeeded,
+                wall_time_seconds=time.perf_counter() - start_wall_time,
+                cpu_time_seconds=time.thread_time() - start_cpu_time,
+                child_cpu_time_seconds=(
+                    _cpu_time(children_usage) - _cpu_time(start_children_usage)
+                ),
+                input_files=len(input_files),
+                input_bytes=_total_size(input_files),
+                output_files=len(outputs),
+                output_bytes=_total_size(outputs),
+                peak_rss_bytes=_peak_rss_bytes(),
+                metrics=metrics,
+                peak_rss_bytes_by_file=file_peak_rss,
+            )
+            with self._lock:
+                self._tasks[name] = report
+
+    def write(self, *, ingest_tmpdir: Path, succeeded: bool) -> Path:
+        """Write the report for all tasks so far to `ingest_tmpdir`."""
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        with self._lock:
+            tasks = dict(self._tasks)
+
+        report = RunReport(
+            data_source=self.data_source,
+            started_at=self.started_at,
+            succeeded=succeeded,
+            jobs=self.jobs,
+            totals=ResourceUsage(
+                wall_time_seconds=time.perf_counter() - self._start_wall_time,
+                cpu_time_seconds=(
+                    _cpu_time(self_usage) - _cpu_time(self._start_self_usage)
+                ),
+                child_cpu_time_seconds=(
+                    _cpu_time(children_usage) - _cpu_time(self._start_children_usage)
+                ),
+                input_files=sum(t.input_files for t in tasks.values()),
+                input_bytes=sum(t.input_bytes for t in tasks.values()),
+                output_files=sum(t.output_files for t in tasks.values()),
+                output_bytes=sum(t.output_bytes for t in tasks.values()),
+                peak_rss_bytes=_peak_rss_bytes(),
+            ),
+            tasks={str(name): task for name, task in tasks.items()},
+        )
+
+        report_fp = ingest_tmpdir / OUTPUT_RUN_REPORT_FILE
+        report_fp.write_text(report.model_dump_json(by_alias=True, indent=2))
+        logger.info(
+            f"Run report written to '{report_fp}'"
+            f" ({report.totals.wall_time_seconds:.1f}s wall time)."
+        )
+        return report_fp
+
+
+def _files(path: Path | dict[str, Path]) -> list[Path]:
+    if isinstance(path, dict):
+        return [f for p in path.values() for f in _files(p)]
+    if path.is_file():
+        return [path]
+    if path.is_dir():
+        return [f for f in path.rglob("*") if f.is_file()]
+    return []
+
+
+def _total_size(files: list[Path]) -> int:
+    return sum(os.stat(f).st_size for f in files)
+
+
+def _cpu_time(usage: resource.struct_rusage) -> float:
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_bytes() -> int:
+    return _MAXRSS_UNIT * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
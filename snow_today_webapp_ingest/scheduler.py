@@ -0,0 +1,79 @@
+"""Run ingest tasks concurrently, respecting the dependencies declared between them."""
+
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TypeVar
+
+from loguru import logger
+
+from snow_today_webapp_ingest.data_classes import OutputDataClass, OutputDataClassName
+
+TaskName = OutputDataClassName
+T = TypeVar("T")
+
+
+def run_ingest_tasks(  # noqa: C901
+    tasks: dict[TaskName, OutputDataClass],
+    *,
+    run_task: Callable[[TaskName, OutputDataClass], T],
+    jobs: int,
+) -> dict[TaskName, T]:
+    """Call `run_task` for each of `tasks` on a pool of at most `jobs` threads.
+
+    A task is started as soon as every task it `depends_on` has completed. Dependencies
+    on tasks which aren't in `tasks` (e.g. because they were filtered out on the command
+    line) are ignored.
+
+    If a task fails, no more tasks are started. Tasks which are already running are
+    allowed to finish, then the first error is re-raised.
+
+    Returns the result of `run_task` for each task.
+    """
+    waiting_on = {
+        name: {dep for dep in data_class.depends_on if dep in tasks}
+        for name, data_class in tasks.items()
+    }
+    running: dict[Future[T], TaskName] = {}
+    results: dict[TaskName, T] = {}
+    errors: list[BaseException] = []
+
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="ingest") as pool:
+        while waiting_on or running:
+            if not errors:
+                for name in _pop_ready(waiting_on):
+                    future = pool.submit(run_task, name, tasks[name])
+                    running[future] = name
+
+            if not running:
+                if errors:
+                    break
+                raise RuntimeError(
+                    f"Dependency cycle between ingest tasks: {sorted(waiting_on)}"
+                )
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                if (error := future.exception()) is not None:
+                    logger.error(f"Task {name} failed: {error}")
+                    errors.append(error)
+                    continue
+
+                results[name] = future.result()
+                for deps in waiting_on.values():
+                    deps.discard(name)
+
+    if errors:
+        if waiting_on:
+            logger.warning(f"Skipped tasks due to failure: {sorted(waiting_on)}")
+        raise errors[0]
+
+    return results
+
+
+def _pop_ready(waiting_on: dict[TaskName, set[TaskName]]) -> list[TaskName]:
+    """Remove and return the tasks in `waiting_on` which have no unmet dependencies."""
+    ready = [name for name, deps in waiting_on.items() if not deps]
+    for name in ready:
+        del waiting_on[name]
+    return ready
@@ -0,0 +1,51 @@
+"""Options which change how ingest tasks run.
+
+Ingest functions only receive input and output paths, so options for a whole ingest run
+are set here by the CLI before any task starts, and read by the tasks which need them.
+"""
+
+import json
+from dataclasses import asdict, dataclass
+from typing import Final, Literal
+
+CogValidationMode = Literal["header", "full"]
+JsonPublishMode = Literal["copy", "hardlink", "minify"]
+
+# Settings which change what ingest tasks output, as opposed to how they run
+OUTPUT_SETTINGS: Final = ("cog_web_mercator", "json_publish_mode")
+
+
+@dataclass(frozen=True)
+class IngestSettings:
+    # "header" checks each COG's structure; "full" also checks the layout of every block
+    cog_validation: CogValidationMode = "header"
+    # Reproject COGs to Web Mercator (EPSG:3857), aligned to web map tiles
+    cog_web_mercator: bool = False
+    # How validated JSON files are written: "copy" and "hardlink" publish the input
+    # bytes unchanged; "minify" re-serializes them without whitespace
+    json_publish_mode: JsonPublishMode = "copy"
+    # Processes validating JSON files which match a pattern, e.g. plots; None for one
+    # per available CPU
+    validate_workers: int | None = None
+    # Fail the ingest if outputs reference files or IDs which don't exist, instead of
+    # only warning
+    strict_references: bool = False
+    # Write a `.br` sibling of each text output, as well as `.gz`
+    precompress_brotli: bool = False
+
+    def output_fingerprint(self) -> str:
+        """Identify the settings which change outputs, for incremental ingest."""
+        settings = asdict(self)
+        return json.dumps({name: settings[name] for name in OUTPUT_SETTINGS})
+
+
+_settings = IngestSettings()
+
+
+def ingest_settings() -> IngestSettings:
+    return _settings
+
+
+def configure_ingest(settings: IngestSettings) -> None:
+    global _settings
+    _settings = settings
@@ -0,0 +1,38 @@
+from typing import Literal
+
+from pydantic import Field
+
+from snow_today_webapp_ingest.types_.base import BaseModel
+
+
+class CogProfile(BaseModel):
+    """Encoding options for a Cloud-Optimized GeoTIFF."""
+
+    compress: Literal["LZW", "DEFLATE", "ZSTD"]
+    level: int | None = Field(
+        default=None,
+        description="Compression level; higher is smaller but slower to encode",
+    )
+    predictor: Literal[1, 2, 3] | None = Field(
+        default=None,
+        description="1: none; 2: horizontal differencing; 3: floating point",
+    )
+    blocksize: int = Field(default=512, description="Tile width and height in pixels")
+    overview_count: int | None = Field(
+        default=None,
+        description="Number of overview levels. Default: until the image fits a tile",
+    )
+    overview_resampling: str = "NEAREST"
+
+    @property
+    def creation_options(self) -> list[str]:
+        """Options for GDAL's COG driver."""
+        options = {
+            "COMPRESS": self.compress,
+            "LEVEL": self.level,
+            "PREDICTOR": self.predictor,
+            "BLOCKSIZE": self.blocksize,
+            "OVERVIEW_COUNT": self.overview_count,
+            "OVERVIEW_RESAMPLING": self.overview_resampling,
+        }
+        return [f"{k}={v}" for k, v in options.items() if v is not None]
@@ -0,0 +1,3 @@
+from typing import Literal
+
+CogProfileName = Literal["lzw", "deflate", "zstd", "zstd-fast"]
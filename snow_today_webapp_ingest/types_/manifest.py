@@ -0,0 +1,22 @@
+from pathlib import Path
+
+from pydantic import Field
+
+from snow_today_webapp_ingest.types_.base import BaseModel, RootModel
+
+
+class IngestManifestEntry(BaseModel):
+    """The inputs and outputs of a single ingest task."""
+
+    fingerprint: str = Field(
+        description="Hash of the task's input files and the ingest code version",
+    )
+    outputs: list[Path] = Field(
+        description="Files written by the task, relative to the output directory",
+    )
+
+
+class IngestManifest(RootModel):
+    """Mapping of output data class names to their ingest task's inputs and outputs."""
+
+    root: dict[str, IngestManifestEntry]
@@ -0,0 +1,29 @@
+from pydantic import Field
+
+from snow_today_webapp_ingest.types_.base import BaseModel
+
+
+class RasterHistogram(BaseModel):
+    """Counts of valid pixels in equal-width bins of data values."""
+
+    bin_edges: list[float] = Field(
+        description=(
+            "The edges of each bin; one more than the number of bins. Values outside"
+            " the first and last edges are counted in the first and last bins."
+        ),
+    )
+    counts: list[int]
+
+
+class RasterStats(BaseModel):
+    """Summary of the values in a raster, excluding no-data pixels."""
+
+    valid_pixels: int
+    no_data_fraction: float = Field(ge=0, le=1)
+    min: int | None = Field(description="Null if no valid pixels")
+    max: int | None = Field(description="Null if no valid pixels")
+    mean: float | None = Field(description="Null if no valid pixels")
+    percentiles: dict[str, int] = Field(
+        description="Keyed by percentile, e.g. 'p50'. Empty if no valid pixels",
+    )
+    histogram: RasterHistogram
@@ -0,0 +1,60 @@
+import datetime as dt
+
+from pydantic import Field
+
+from snow_today_webapp_ingest.types_.base import BaseModel
+from snow_today_webapp_ingest.types_.data_sources import DataSource
+
+MetricValue = int | float | bool
+
+
+class ResourceUsage(BaseModel):
+    """Resources consumed while ingesting."""
+
+    wall_time_seconds: float
+    cpu_time_seconds: float = Field(
+        description="CPU time used by the ingest process (or, for a task, its thread)",
+    )
+    child_cpu_time_seconds: float = Field(
+        description=(
+            "CPU time used by child processes which exited during ingest (or, for a"
+            " task, while it was running; this includes children of concurrent tasks)"
+        ),
+    )
+    input_files: int
+    input_bytes: int = Field(description="Total size of input files")
+    output_files: int
+    output_bytes: int = Field(description="Total size of output files")
+    peak_rss_bytes: int = Field(
+        description=(
+            "Peak resident memory of the ingest process or its largest child (for a"
+            " task, the peak observed by the time it completed)"
+        ),
+    )
+
+
+class TaskReport(ResourceUsage):
+    """Report on a single ingest task."""
+
+    succeeded: bool
+    metrics: dict[str, MetricValue] = Field(
+        description="Task-specific measurements, e.g. number of files reused",
+    )
+    peak_rss_bytes_by_file: dict[str, int] = Field(
+        default_factory=dict,
+        description=(
+            "Peak resident memory of the worker process while it processed each file,"
+            " for tasks which measure it"
+        ),
+    )
+
+
+class RunReport(BaseModel):
+    """Report on an ingest run, for monitoring and capacity planning."""
+
+    data_source: DataSource
+    started_at: dt.datetime
+    succeeded: bool
+    jobs: int
+    totals: ResourceUsage
+    tasks: dict[str, TaskReport]
@@ -3,9 +3,12 @@ from typing import Literal
 from pydantic import Field
 
 from snow_today_webapp_ingest.types_.base import BaseModel, RootModel
+from snow_today_webapp_ingest.types_.cog_profile_name import CogProfileName
 from snow_today_webapp_ingest.types_.misc import NumericIdentifier, StringIdentifier
 
 SatelliteVariableIdentifier = NumericIdentifier
+# GDAL resampling algorithms suitable for our (mostly categorical or integer) data
+WarpResampling = Literal["nearest", "mode", "bilinear", "cubic", "average"]
 SweVariableIdentifier = StringIdentifier
 
 
@@ -65,6 +68,17 @@ class SatelliteVariable(BaseModel):
     no_data_value: int
     colormap_id: int
     transparent_zero: bool
+    cog_profile: CogProfileName | None = Field(
+        default=None,
+        description="How to encode this variable's COGs. Default: 'lzw'",
+    )
+    warp_resampling: WarpResampling | None = Field(
+        default=None,
+        description=(
+            "How to resample when reprojecting this variable's COGs to Web Mercator."
+            " Default: 'nearest'"
+        ),
+    )
 
 
 class SatelliteVariablesIndex(RootModel):
@@ -0,0 +1,286 @@
+"""Check that COGs are laid out for efficient HTTP range requests.
+
+Based on GDAL's `validate_cloud_optimized_geotiff.py` (`scripts/validate_cog.py`), but
+reads the TIFF structure directly instead of through GDAL. The full check compares the
+whole tile offset and byte count arrays of each image at once with NumPy, instead of
+querying GDAL for each block.
+
+Functions in this module may run in worker processes; keep imports light.
+"""
+
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+
+_TAG_NEW_SUBFILE_TYPE = 254
+_TAG_IMAGE_WIDTH = 256
+_TAG_IMAGE_LENGTH = 257
+_TAG_TILE_OFFSETS = 324
+_TAG_TILE_BYTE_COUNTS = 325
+_SUBFILE_TYPE_MASK = 4
+
+# Integer TIFF field types: BYTE, SHORT, LONG, LONG8
+_INTEGER_FIELD_DTYPES = {1: "u1", 3: "u2", 4: "u4", 16: "u8"}
+
+_GHOST_AREA_PATTERN = "GDAL_STRUCTURAL_METADATA_SIZE=000000 bytes\n"
+# The number of errors reported for each kind of per-block problem
+_MAX_BLOCK_ERRORS = 3
+
+
+@dataclass
+class _Ifd:
+    offset: int
+    width: int
+    height: int
+    is_mask: bool
+    # Empty if the image isn't tiled
+    tile_offsets: np.ndarray
+    tile_byte_counts: np.ndarray
+
+    @property
+    def present(self) -> np.ndarray:
+        """Select tiles which exist in the file (sparse files may omit some)."""
+        return (self.tile_offsets > 0) & (self.tile_byte_counts > 0)
+
+
+@dataclass
+class _Tiff:
+    endian: str
+    bigtiff: bool
+    header_size: int
+    ghost_area: str | None
+    ifds: list[_Ifd]
+
+
+def validate_cog(path: Path, *, full: bool) -> list[str]:
+    """Return the problems with the COG at `path`; an empty list if it's valid.
+
+    Without `full`, only the TIFF header and IFDs are read. With `full`, the layout of
+    every block is checked too.
+    """
+    try:
+        with open(path, "rb") as f:
+            tiff = _read_tiff(f)
+    except (ValueError, struct.error) as e:
+        return [f"Not a readable TIFF: {e}"]
+
+    errors = _check_header(tiff)
+    if full and not errors:
+        errors += _check_blocks(tiff, path=path)
+    return errors
+
+
+def count_omitted_blocks(path: Path) -> tuple[int, int]:
+    """Return how many blocks of the COG at `path` are omitted, out of how many.
+
+    Sparse COGs omit blocks which are entirely no-data. Blocks of every image, including
+    overviews, are counted.
+    """
+    with open(path, "rb") as f:
+        images = [ifd for ifd in _read_tiff(f).ifds if not ifd.is_mask]
+
+    blocks = sum(len(ifd.tile_offsets) for ifd in images)
+    present = sum(int(np.count_nonzero(ifd.present)) for ifd in images)
+    return blocks - present, blocks
+
+
+def _check_header(tiff: _Tiff) -> list[str]:
+    if tiff.ghost_area is None:
+        return ["Missing GDAL structural metadata; not written by GDAL's COG driver"]
+
+    errors = []
+    if "LAYOUT=IFDS_BEFORE_DATA" not in tiff.ghost_area:
+        errors.append("IFDs are not declared to be before image data")
+    if "KNOWN_INCOMPATIBLE_EDITION=YES" in tiff.ghost_area:
+        errors.append("File was edited after creation; layout is no longer optimized")
+
+    expected_ifd_offset = (
+        tiff.header_size + len(_GHOST_AREA_PATTERN) + len(tiff.ghost_area)
+    )
+    expected_ifd_offset += expected_ifd_offset % 2
+    if tiff.ifds[0].offset != expected_ifd_offset:
+        errors.append(
+            f"Main IFD is at byte {tiff.ifds[0].offset}, not {expected_ifd_offset}"
+        )
+
+    return errors + _check_ifds(tiff.ifds)
+
+
+def _check_ifds(ifds: list[_Ifd]) -> list[str]:
+    errors = []
+    images = [ifd for ifd in ifds if not ifd.is_mask]
+    for i, ifd in enumerate(images):
+        if ifd.tile_offsets.size == 0:
+            errors.append(f"Image {i} is not tiled")
+        previous = images[i - 1]
+        if i > 0 and (ifd.width > previous.width or ifd.height > previous.height):
+            errors.append(f"Overview {i} is larger than the image before it")
+
+    ifd_offsets = [ifd.offset for ifd in ifds]
+    if ifd_offsets != sorted(ifd_offsets):
+        errors.append("IFDs are not in increasing order")
+
+    data_offsets = [ifd.tile_offsets[ifd.present] for ifd in ifds]
+    first_data_offset = min(
+        (int(o.min()) for o in data_offsets if o.size), default=None
+    )
+    if first_data_offset is not None and first_data_offset < max(ifd_offsets):
+        errors.append("Image data starts before the last IFD")
+
+    return errors
+
+
+def _check_blocks(tiff: _Tiff, *, path: Path) -> list[str]:
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    ghost_area = tiff.ghost_area or ""
+    errors: list[str] = []
+
+    previous_offsets = None
+    for i, ifd in enumerate(ifd for ifd in tiff.ifds if not ifd.is_mask):
+        name = "Main image" if i == 0 else f"Overview {i}"
+        block_ids = np.flatnonzero(ifd.present)
+        offsets = ifd.tile_offsets[block_ids].astype(np.int64)
+        byte_counts = ifd.tile_byte_counts[block_ids].astype(np.int64)
+        if offsets.size == 0:
+            continue
+
+        if np.any(offsets - 4 < 0) or np.any(offsets + byte_counts + 4 > data.size):
+            errors.append(f"{name}: blocks extend outside the file")
+            continue
+
+        if "BLOCK_ORDER=ROW_MAJOR" in ghost_area and np.any(np.diff(offsets) <= 0):
+            errors.append(f"{name}: blocks are not in row-major order")
+
+        # Smaller overviews' data must come first, so a client zooming in reads forwards
+        if previous_offsets is not None and offsets.max() > previous_offsets.min():
+            errors.append(f"{name}: data is not before the data of the larger image")
+        previous_offsets = offsets
+
+        if "BLOCK_LEADER=SIZE_AS_UINT4" in ghost_area:
+            leaders = _gather_uint32(data, offsets - 4, endian=tiff.endian)
+            errors += _block_errors(
+                name,
+                "leader size is wrong",
+                block_ids[leaders != byte_counts],
+            )
+
+        if "BLOCK_TRAILER=LAST_4_BYTES_REPEATED" in ghost_area:
+            has_trailer = byte_counts >= 4
+            ends = (offsets + byte_counts)[has_trailer]
+            trailers_ok = np.all(
+                data[ends[:, None] - 4 + np.arange(4)]
+                == data[ends[:, None] + np.arange(4)],
+                axis=1,
+            )
+            errors += _block_errors(
+                name,
+                "trailer bytes are wrong",
+                block_ids[has_trailer][~trailers_ok],
+            )
+
+    return errors
+
+
+def _gather_uint32(data: np.ndarray, offsets: np.ndarray, *, endian: str) -> np.ndarray:
+    """Read a uint32 at each of `offsets` in `data`."""
+    raw = np.ascontiguousarray(data[offsets[:, None] + np.arange(4)])
+    return raw.view(f"{endian}u4").ravel()
+
+
+def _block_errors(name: str, problem: str, bad_blocks: np.ndarray) -> list[str]:
+    errors = [f"{name}: block {b}: {problem}" for b in bad_blocks[:_MAX_BLOCK_ERRORS]]
+    if bad_blocks.size > _MAX_BLOCK_ERRORS:
+        errors.append(f"{name}: ...and {bad_blocks.size - _MAX_BLOCK_ERRORS} more")
+    return errors
+
+
+def _read_tiff(f: BinaryIO) -> _Tiff:
+    header = f.read(16)
+    if header[:2] == b"II":
+        endian = "<"
+    elif header[:2] == b"MM":
+        endian = ">"
+    else:
+        raise ValueError("bad byte order mark")
+
+    (version,) = struct.unpack(f"{endian}H", header[2:4])
+    if version == 42:
+        bigtiff, header_size = False, 8
+        (ifd_offset,) = struct.unpack(f"{endian}I", header[4:8])
+    elif version == 43:
+        bigtiff, header_size = True, 16
+        (ifd_offset,) = struct.unpack(f"{endian}Q", header[8:16])
+    else:
+        raise ValueError(f"unknown version {version}")
+
+    f.seek(header_size)
+    ghost_area = None
+    pattern = f.read(len(_GHOST_AREA_PATTERN)).decode("latin-1")
+    if pattern.startswith("GDAL_STRUCTURAL_METADATA_SIZE="):
+        size = int(pattern[len("GDAL_STRUCTURAL_METADATA_SIZE=") :][:6])
+        ghost_area = f.read(size).decode("latin-1")
+
+    ifds = []
+    while ifd_offset:
+        ifd, ifd_offset = _read_ifd(f, ifd_offset, endian=endian, bigtiff=bigtiff)
+        ifds.append(ifd)
+    if not ifds:
+        raise ValueError("no IFDs")
+
+    return _Tiff(
+        endian=endian,
+        bigtiff=bigtiff,
+        header_size=header_size,
+        ghost_area=ghost_area,
+        ifds=ifds,
+    )
+
+
+def _read_ifd(
+    f: BinaryIO, offset: int, *, endian: str, bigtiff: bool
+) -> tuple[_Ifd, int]:
+    """Read the IFD at `offset`, and return it with the offset of the next IFD."""
+    count_format, entry_size, value_size = ("Q", 20, 8) if bigtiff else ("H", 12, 4)
+    offset_format = "Q" if bigtiff else "I"
+
+    f.seek(offset)
+    (entry_count,) = struct.unpack(
+        f"{endian}{count_format}",
+        f.read(struct.calcsize(count_format)),
+    )
+    entries = f.read(entry_count * entry_size)
+    (next_offset,) = struct.unpack(f"{endian}{offset_format}", f.read(value_size))
+
+    tags: dict[int, np.ndarray] = {}
+    for i in range(entry_count):
+        entry = entries[i * entry_size : (i + 1) * entry_size]
+        tag, field_type = struct.unpack(f"{endian}HH", entry[:4])
+        if field_type not in _INTEGER_FIELD_DTYPES:
+            continue
+
+        (count,) = struct.unpack(f"{endian}{offset_format}", entry[4 : 4 + value_size])
+        dtype = np.dtype(f"{endian}{_INTEGER_FIELD_DTYPES[field_type]}")
+        value = entry[4 + value_size :]
+        if count * dtype.itemsize > value_size:
+            # The values don't fit in the entry; `value` is their offset
+            (values_offset,) = struct.unpack(f"{endian}{offset_format}", value)
+            f.seek(values_offset)
+            value = f.read(count * dtype.itemsize)
+        tags[tag] = np.frombuffer(value[: count * dtype.itemsize], dtype=dtype)
+
+    empty = np.zeros(0, dtype=np.uint64)
+    ifd = _Ifd(
+        offset=offset,
+        width=int(tags[_TAG_IMAGE_WIDTH][0]),
+        height=int(tags[_TAG_IMAGE_LENGTH][0]),
+        is_mask=bool(
+            tags.get(_TAG_NEW_SUBFILE_TYPE, np.zeros(1, dtype=np.uint32))[0]
+            & _SUBFILE_TYPE_MASK
+        ),
+        tile_offsets=tags.get(_TAG_TILE_OFFSETS, empty),
+        tile_byte_counts=tags.get(_TAG_TILE_BYTE_COUNTS, empty),
+    )
+    return ifd, next_offset
@@ -4,3 +4,15 @@ class UnsupportedRegionError(Exception):
 
 class UnexpectedInputError(Exception):
     pass
+
+
+class InvalidCogError(Exception):
+    pass
+
+
+class InvalidJsonError(Exception):
+    pass
+
+
+class DanglingReferenceError(Exception):
+    pass
@@ -0,0 +1,70 @@
+"""Run GDAL in worker processes, without shelling out to GDAL's CLI tools.
+
+Functions in this module run in worker processes started with `init_gdal_worker`. They
+should only import what they need, to keep worker start-up fast.
+"""
+
+import uuid
+from pathlib import Path
+
+
+def init_gdal_worker(config_options: dict[str, str]) -> None:
+    """Register GDAL's drivers and set `config_options` once per worker process."""
+    from osgeo import gdal
+
+    gdal.UseExceptions()
+    gdal.AllRegister()
+    for key, value in config_options.items():
+        gdal.SetConfigOption(key, value)
+
+
+def gdal_version() -> str:
+    from osgeo import gdal
+
+    return gdal.VersionInfo("RELEASE_NAME")
+
+
+def translate(
+    input_path: Path,
+    output_path: Path,
+    *,
+    output_format: str,
+    creation_options: list[str],
+    no_data_value: int | None = None,
+    in_memory: bool = True,
+) -> Path:
+    """Translate `input_path` to `output_path` in `output_format`.
+
+    If `no_data_value` is set, it's declared as the output's no-data value; pixel values
+    are unchanged.
+
+    If `in_memory`, the output is built in `/vsimem/` and written to `output_path` in
+    one sequential copy, instead of by GDAL's many small, seeking writes.
+
+    Raises RuntimeError if GDAL fails.
+    """
+    from osgeo import gdal
+
+    dest = f"/vsimem/{uuid.uuid4().hex}/{output_path.name}" if in_memory else None
+    try:
+        dataset = gdal.Translate(
+            dest or str(output_path),
+            str(input_path),
+            format=output_format,
+            creationOptions=creation_options,
+            noData=no_data_value,
+        )
+        if dataset is None:
+            raise RuntimeError(gdal.GetLastErrorMsg())
+        # Closing the dataset finishes writing it.
+        dataset = None
+
+        if dest is not None and gdal.CopyFile(dest, str(output_path)) != 0:
+            raise RuntimeError(f"Failed to write {output_path}")
+    except RuntimeError as e:
+        raise RuntimeError(f"GDAL failed to translate {input_path}: {e}") from e
+    finally:
+        if dest is not None:
+            gdal.Unlink(dest)
+
+    return output_path
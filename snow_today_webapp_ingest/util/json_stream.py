@@ -0,0 +1,143 @@
+"""Read large JSON documents one value at a time, in bounded memory.
+
+`json.loads` holds the whole text and the whole decoded document in memory at once;
+for large files, the decoded objects take many times the size of the file. A
+`JsonStream` walks the outer structure of a document itself, and decodes only one
+inner value (e.g. one GeoJSON feature) at a time, so memory use depends on the largest
+value instead of the whole file.
+"""
+
+import json
+import re
+from collections.abc import Iterator
+from typing import Any, TextIO
+
+# Files at least this large are streamed instead of loaded whole
+STREAM_MIN_BYTES = 16 * 1024**2
+# Characters read from the file at a time, at least
+STREAM_READ_CHARS = 1024**2
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters which may continue a number, up to the end of the buffer
+_NUMBER_TAIL = re.compile(r"[0-9+\-.eE]*\Z")
+
+
+class JsonStream:
+    """Read a JSON document from `file` one value at a time.
+
+    Raises ValueError if the document isn't valid JSON.
+    """
+
+    def __init__(self, file: TextIO) -> None:
+        self._file = file
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        # Characters dropped from the start of the buffer, for error messages
+        self._offset = 0
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character, or "" at the end of the file."""
+        self._skip_whitespace()
+        return self._buffer[self._pos : self._pos + 1]
+
+    def read_value(self) -> tuple[Any, str]:
+        """Decode the next value. Return it and its JSON text."""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                error_position = self._offset + e.pos
+                if self._read_more():
+                    continue
+                raise ValueError(f"{e.msg} at character {error_position}") from e
+
+            # A number at the end of the buffer may continue in the next read, e.g.
+            # "0." is decoded as 0 until the rest of "0.5" arrives.
+            is_number = isinstance(value, int | float)
+            if (
+                is_number
+                and _NUMBER_TAIL.match(self._buffer, end)
+                and self._read_more()
+            ):
+                continue
+
+            text = self._buffer[self._pos : end]
+            self._pos = end
+            return value, text
+
+    def iter_object(self) -> Iterator[str]:
+        """Iterate over the keys of the object at the current position.
+
+        After each key, read its value (e.g. with `read_value`) before continuing.
+        """
+        self._expect("{")
+        if self.peek() == "}":
+            self._expect("}")
+            return
+
+        while True:
+            key_position = self._position
+            key, _ = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected a key at character {key_position}")
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def iter_array(self) -> Iterator[int]:
+        """Iterate over the indexes of the array at the current position.
+
+        After each index, read its value before continuing.
+        """
+        self._expect("[")
+        if self.peek() == "]":
+            self._expect("]")
+            return
+
+        index = 0
+        while True:
+            yield index
+            if self._expect(",]") == "]":
+                return
+            index += 1
+
+    def end(self) -> None:
+        """Check that nothing but whitespace follows the document."""
+        if self.peek():
+            raise ValueError(f"Extra data at character {self._position}")
+
+    @property
+    def _position(self) -> int:
+        return self._offset + self._pos
+
+    def _expect(self, chars: str) -> str:
+        """Consume the next non-whitespace character, which must be one of `chars`."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} at character {self._position}")
+        self._pos += 1
+        return char
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()  # type: ignore[union-attr]
+            if self._pos < len(self._buffer) or not self._read_more():
+                return
+
+    def _read_more(self) -> bool:
+        """Drop what's been read from the buffer, and read more of the file into it.
+
+        Reads at least as much as is left in the buffer, so a value which spans many
+        reads is decoded a bounded number of times. Returns False at the end of the
+        file.
+        """
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos :]
+        self._pos = 0
+
+        chunk = self._file.read(max(STREAM_READ_CHARS, len(self._buffer)))
+        self._buffer += chunk
+        return bool(chunk)
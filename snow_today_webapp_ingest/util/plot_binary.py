@@ -0,0 +1,174 @@
+"""Encode plot payloads as compact binary columns, for browsers to read without parsing.
+
+Each column is stored as a little-endian typed array at an 8-byte-aligned offset, so a
+client can view it directly (e.g. as a JavaScript `Float32Array`) instead of parsing
+thousands of JSON numbers. The layout is:
+
+* 8 bytes: `PLOT_BINARY_MAGIC`
+* uint32: format version (`PLOT_BINARY_VERSION`)
+* uint32: header length in bytes
+* header: UTF-8 JSON, padded with spaces to a multiple of 8 bytes, e.g.:
+
+      {"metadata": {"minYear": 2013, "maxYear": 2022}, "rows": 365, "columns": [
+        {"name": "dayOfWaterYear", "type": "uint16", "offset": 616},
+        {"name": "date", "type": "date32", "offset": 1352},
+        {"name": "yearToDate", "type": "float32", "offset": 2816,
+         "nullMaskOffset": 4280},
+        ...
+      ]}
+
+* column data, at the header's `offset`s (from the start of the file)
+
+`date32` is days since 1970-01-01, as an int32. Float columns are float32 (about 7
+significant digits); nulls are NaN, and also set in the column's null mask: bit `i % 8`
+(least significant first) of byte `i // 8` is set if row `i` is null. Columns without
+nulls have no null mask.
+"""
+
+import json
+import struct
+from typing import Any
+
+import numpy as np
+
+from snow_today_webapp_ingest.types_.plot import PlotData, PlotPayload
+
+PLOT_BINARY_MAGIC = b"STPLOT\r\n"
+PLOT_BINARY_VERSION = 1
+PLOT_BINARY_SUFFIX = ".bin"
+_PREFIX = struct.Struct("<8sII")
+_ALIGNMENT = 8
+_COLUMN_TYPES = {"uint16": "<u2", "date32": "<i4", "float32": "<f4"}
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def plot_column_types() -> dict[str, str]:
+    """Return the binary type of each plot column, by JSON name, in file order."""
+    special = {"day_of_water_year": "uint16", "date": "date32"}
+    return {
+        field.alias or name: special.get(name, "float32")
+        for name, field in PlotData.model_fields.items()
+    }
+
+
+def encode_plot(plot: PlotPayload) -> bytes:
+    """Encode a validated plot payload.
+
+    Raises ValueError if its columns aren't all the same length.
+    """
+    payload = plot.model_dump(by_alias=True, mode="json")
+    data = payload["data"]
+    rows = len(data["dayOfWaterYear"])
+    # Each column's "offset" and "nullMaskOffset" are indexes into `sections` until the
+    # header's size, and so each section's offset, is known.
+    columns: list[dict[str, Any]] = []
+    sections: list[bytes] = []
+    for name, column_type in plot_column_types().items():
+        values = data[name]
+        if len(values) != rows:
+            raise ValueError(f"Column {name} has {len(values)} rows; expected {rows}")
+
+        column: dict[str, Any] = {
+            "name": name,
+            "type": column_type,
+            "offset": len(sections),
+        }
+        sections.append(_pad(_column_bytes(values, column_type=column_type)))
+        nulls = np.array([value is None for value in values])
+        if nulls.any():
+            column["nullMaskOffset"] = len(sections)
+            sections.append(_pad(np.packbits(nulls, bitorder="little").tobytes()))
+        columns.append(column)
+
+    # Longer offsets make the header longer, which moves the sections further along
+    body_offset = _PREFIX.size
+    while True:
+        offsets = [
+            body_offset + sum(len(s) for s in sections[:i])
+            for i in range(len(sections))
+        ]
+        header = _header(payload["metadata"], rows, columns, offsets=offsets)
+        if _PREFIX.size + len(header) == body_offset:
+            break
+        body_offset = _PREFIX.size + len(header)
+
+    return b"".join(
+        [
+            _PREFIX.pack(PLOT_BINARY_MAGIC, PLOT_BINARY_VERSION, len(header)),
+            header,
+            *sections,
+        ]
+    )
+
+
+def decode_plot(encoded: bytes) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    """Decode an encoded plot. Return its metadata and each column, by JSON name.
+
+    Columns are read-only views of `encoded`, except dates, which are converted to
+    `datetime64[D]`. Nulls are NaN.
+
+    Raises ValueError if `encoded` isn't an encoded plot.
+    """
+    if len(encoded) < _PREFIX.size:
+        raise ValueError("Not an encoded plot: too short")
+    magic, version, header_length = _PREFIX.unpack_from(encoded)
+    if magic != PLOT_BINARY_MAGIC:
+        raise ValueError("Not an encoded plot: wrong magic bytes")
+    if version != PLOT_BINARY_VERSION:
+        raise ValueError(f"Unsupported encoded plot version {version}")
+
+    header = json.loads(encoded[_PREFIX.size : _PREFIX.size + header_length])
+    rows = header["rows"]
+    columns: dict[str, np.ndarray] = {}
+    for column in header["columns"]:
+        values = np.frombuffer(
+            encoded,
+            dtype=_COLUMN_TYPES[column["type"]],
+            count=rows,
+            offset=column["offset"],
+        )
+        if column["type"] == "date32":
+            values = _EPOCH + values.astype("timedelta64[D]")
+        columns[column["name"]] = values
+
+    return header["metadata"], columns
+
+
+def _column_bytes(values: list, *, column_type: str) -> bytes:
+    if column_type == "date32":
+        days = np.array(values, dtype="datetime64[D]") - _EPOCH
+        return days.astype(_COLUMN_TYPES[column_type]).tobytes()
+    # None becomes NaN
+    return np.array(values, dtype=_COLUMN_TYPES[column_type]).tobytes()
+
+
+def _header(
+    metadata: dict[str, Any],
+    rows: int,
+    columns: list[dict[str, Any]],
+    *,
+    offsets: list[int],
+) -> bytes:
+    """Serialize the header, with each column's section indexes replaced by offsets."""
+    located = [
+        {
+            **column,
+            **{
+                key: offsets[column[key]]
+                for key in ("offset", "nullMaskOffset")
+                if key in column
+            },
+        }
+        for column in columns
+    ]
+    header = json.dumps(
+        {"metadata": metadata, "rows": rows, "columns": located},
+        separators=(",", ":"),
+    ).encode()
+    # Spaces are valid trailing JSON whitespace
+    return _pad(header, fill=b" ")
+
+
+def _pad(section: bytes, *, fill: bytes = b"\0") -> bytes:
+    """Pad `section` to a multiple of the alignment."""
+    return section.ljust(-(-len(section) // _ALIGNMENT) * _ALIGNMENT, fill)
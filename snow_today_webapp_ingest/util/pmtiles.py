@@ -0,0 +1,275 @@
+"""Write map tiles to a single-file PMTiles (version 3) archive.
+
+PMTiles archives are read by clients with HTTP range requests: the header and root
+directory are in the first 16KiB, and point to the tiles or to leaf directories. See
+<https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md>.
+
+Tile data is streamed straight to the archive as tiles are added, in any order. Only
+the directory entries (24 bytes per tile) and a digest of each distinct tile are kept in
+memory.
+"""
+
+import gzip
+import hashlib
+import json
+import math
+import struct
+from array import array
+from pathlib import Path
+from types import TracebackType
+from typing import Literal, Self
+
+import numpy as np
+
+PMTILES_HEADER_BYTES = 127
+# Clients fetch this much of the archive first; the root directory must fit in it.
+PMTILES_ROOT_BYTES = 16384
+PMTILES_TILE_TYPES = {"PNG": 2, "WEBP": 4}
+_COMPRESSION_NONE = 1
+_COMPRESSION_GZIP = 2
+_LEAF_ENTRIES_MIN = 4096
+
+PmtilesTileType = Literal["PNG", "WEBP"]
+
+
+def tile_id(z: int, x: int, y: int) -> int:
+    """Return the PMTiles ID of a tile: its position on the Hilbert curve of tiles."""
+    # Tile IDs at zoom `z` start after all tiles at lower zooms
+    acc = ((1 << (2 * z)) - 1) // 3
+    d = 0
+    s = 1 << z >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x, y = s - 1 - x, s - 1 - y
+            x, y = y, x
+        s >>= 1
+    return acc + d
+
+
+class PmtilesWriter:
+    """Stream tiles to a PMTiles archive at `path`.
+
+    Identical tiles are stored once. Use as a context manager; the archive is finished
+    on exit, or deleted if there was an error.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        tile_type: PmtilesTileType,
+        metadata: dict,
+    ) -> None:
+        self.path = path
+        self.tile_type = tile_type
+        self.metadata = metadata
+
+        self._file = open(path, "wb")
+        # The header and root directory are written last, in space reserved here.
+        self._file.seek(PMTILES_ROOT_BYTES)
+        self._tile_data_bytes = 0
+        self._tile_ids = array("Q")
+        self._offsets = array("Q")
+        self._lengths = array("Q")
+        self._offsets_by_digest: dict[bytes, int] = {}
+        # (min x, min y, max x, max y) at each zoom level
+        self._tile_ranges: dict[int, tuple[int, int, int, int]] = {}
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.finish()
+        else:
+            self._file.close()
+            self.path.unlink(missing_ok=True)
+
+    def add_tile(self, z: int, x: int, y: int, data: bytes) -> None:
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        offset = self._offsets_by_digest.get(digest)
+        if offset is None:
+            offset = self._offsets_by_digest[digest] = self._tile_data_bytes
+            self._file.write(data)
+            self._tile_data_bytes += len(data)
+
+        self._tile_ids.append(tile_id(z, x, y))
+        self._offsets.append(offset)
+        self._lengths.append(len(data))
+
+        min_x, min_y, max_x, max_y = self._tile_ranges.get(z, (x, y, x, y))
+        self._tile_ranges[z] = (
+            min(min_x, x),
+            min(min_y, y),
+            max(max_x, x),
+            max(max_y, y),
+        )
+
+    def finish(self) -> None:
+        """Write the directories, metadata and header, and close the archive."""
+        if not self._tile_ids:
+            raise RuntimeError(f"No tiles were added to {self.path}")
+
+        entries = self._run_length_entries()
+        root, leaves = _build_directories(entries)
+        metadata = gzip.compress(json.dumps(self.metadata).encode(), mtime=0)
+
+        tile_data_offset = PMTILES_ROOT_BYTES
+        metadata_offset = tile_data_offset + self._tile_data_bytes
+        leaves_offset = metadata_offset + len(metadata)
+        self._file.write(metadata)
+        self._file.write(leaves)
+
+        self._file.seek(0)
+        self._file.write(
+            self._header(
+                sections=[
+                    (PMTILES_HEADER_BYTES, len(root)),
+                    (metadata_offset, len(metadata)),
+                    (leaves_offset, len(leaves)),
+                    (tile_data_offset, self._tile_data_bytes),
+                ],
+                entries=entries,
+            )
+        )
+        self._file.write(root)
+        self._file.close()
+
+    def _run_length_entries(self) -> np.ndarray:
+        """Sort entries by tile ID, merging consecutive tiles with the same content.
+
+        Returns an array of (tile ID, offset, length, run length) rows.
+        """
+        tile_ids = np.frombuffer(self._tile_ids, dtype=np.uint64)
+        order = np.argsort(tile_ids, kind="stable")
+        tile_ids = tile_ids[order]
+        offsets = np.frombuffer(self._offsets, dtype=np.uint64)[order]
+        lengths = np.frombuffer(self._lengths, dtype=np.uint64)[order]
+
+        if np.any(tile_ids[1:] == tile_ids[:-1]):
+            raise ValueError(f"The same tile was added to {self.path} more than once")
+
+        continues_run = (tile_ids[1:] == tile_ids[:-1] + 1) & (
+            offsets[1:] == offsets[:-1]
+        )
+        starts = np.flatnonzero(np.concatenate([[True], ~continues_run]))
+        run_lengths = np.diff(np.append(starts, len(tile_ids)))
+        return np.column_stack(
+            [tile_ids[starts], offsets[starts], lengths[starts], run_lengths]
+        ).astype(np.uint64)
+
+    def _header(
+        self,
+        *,
+        sections: list[tuple[int, int]],
+        entries: np.ndarray,
+    ) -> bytes:
+        min_zoom, max_zoom = min(self._tile_ranges), max(self._tile_ranges)
+        min_x, min_y, max_x, max_y = self._tile_ranges[max_zoom]
+        min_lon, max_lat = _tile_corner_lon_lat(max_zoom, min_x, min_y)
+        max_lon, min_lat = _tile_corner_lon_lat(max_zoom, max_x + 1, max_y + 1)
+
+        def _e7(degrees: float) -> int:
+            return round(degrees * 10_000_000)
+
+        return struct.pack(
+            "<7sB8Q3Q4B2B4iBii",
+            b"PMTiles",
+            3,
+            *(value for section in sections for value in section),
+            int(entries[:, 3].sum()),
+            len(entries),
+            len(self._offsets_by_digest),
+            # Clustered: tile data isn't in tile ID order, because tiles are added in
+            # whatever order they're rendered.
+            0,
+            _COMPRESSION_GZIP,
+            _COMPRESSION_NONE,
+            PMTILES_TILE_TYPES[self.tile_type],
+            min_zoom,
+            max_zoom,
+            _e7(min_lon),
+            _e7(min_lat),
+            _e7(max_lon),
+            _e7(max_lat),
+            min_zoom,
+            _e7((min_lon + max_lon) / 2),
+            _e7((min_lat + max_lat) / 2),
+        )
+
+
+def _tile_corner_lon_lat(z: int, x: int, y: int) -> tuple[float, float]:
+    """Return the longitude and latitude of the top-left corner of a tile."""
+    n = 2**z
+    lon = x / n * 360 - 180
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lon, lat
+
+
+def _build_directories(entries: np.ndarray) -> tuple[bytes, bytes]:
+    """Serialize `entries` as a root directory, and leaf directories if needed.
+
+    Leaf directories are only used when the root directory would be too big, and are
+    made just large enough for the root directory to fit.
+    """
+    root = _serialize_directory(entries)
+    if len(root) <= PMTILES_ROOT_BYTES - PMTILES_HEADER_BYTES:
+        return root, b""
+
+    leaf_entries = _LEAF_ENTRIES_MIN
+    while True:
+        leaves = bytearray()
+        root_entries = []
+        for start in range(0, len(entries), leaf_entries):
+            leaf = _serialize_directory(entries[start : start + leaf_entries])
+            # Run length 0 marks an entry pointing to a leaf directory
+            root_entries.append((entries[start, 0], len(leaves), len(leaf), 0))
+            leaves += leaf
+
+        root = _serialize_directory(np.array(root_entries, dtype=np.uint64))
+        if len(root) <= PMTILES_ROOT_BYTES - PMTILES_HEADER_BYTES:
+            return root, bytes(leaves)
+        leaf_entries *= 2
+
+
+def _serialize_directory(entries: np.ndarray) -> bytes:
+    """Encode (tile ID, offset, length, run length) rows as a gzipped directory."""
+    tile_ids, offsets, lengths, run_lengths = (
+        [int(v) for v in column] for column in entries.T
+    )
+
+    buffer = bytearray()
+    _write_varint(buffer, len(tile_ids))
+
+    last_tile_id = 0
+    for tile_id_ in tile_ids:
+        _write_varint(buffer, tile_id_ - last_tile_id)
+        last_tile_id = tile_id_
+    for run_length in run_lengths:
+        _write_varint(buffer, run_length)
+    for length in lengths:
+        _write_varint(buffer, length)
+    for i, offset in enumerate(offsets):
+        # 0 means "directly after the previous entry's data"
+        if i > 0 and offset == offsets[i - 1] + lengths[i - 1]:
+            _write_varint(buffer, 0)
+        else:
+            _write_varint(buffer, offset + 1)
+
+    return gzip.compress(bytes(buffer), mtime=0)
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
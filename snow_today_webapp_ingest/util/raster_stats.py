@@ -0,0 +1,43 @@
+"""Count the values in a raster with bounded memory.
+
+Functions in this module run in worker processes started with `init_gdal_worker`. Keep
+imports light.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+
+def count_values(path: Path) -> tuple[np.ndarray, int]:
+    """Count the pixels of each value in the first band of the raster at `path`.
+
+    The raster is read one row of blocks at a time, and each row is tallied with
+    `np.bincount`. Returns the counts indexed by value, excluding no-data, and the
+    number of no-data pixels.
+    """
+    from osgeo import gdal
+
+    band = gdal.Open(str(path)).GetRasterBand(1)
+    if band.DataType not in (gdal.GDT_Byte, gdal.GDT_UInt16):
+        raise RuntimeError(f"Can't count values of {path}: not 8- or 16-bit")
+
+    n_values = 256 if band.DataType == gdal.GDT_Byte else 65536
+    counts = np.zeros(n_values, dtype=np.int64)
+    _, block_height = band.GetBlockSize()
+    for y_offset in range(0, band.YSize, block_height):
+        rows = band.ReadAsArray(
+            0,
+            y_offset,
+            band.XSize,
+            min(block_height, band.YSize - y_offset),
+        )
+        counts += np.bincount(rows.ravel(), minlength=n_values)
+
+    no_data_count = 0
+    no_data_value = band.GetNoDataValue()
+    if no_data_value is not None and no_data_value in range(n_values):
+        no_data_count = int(counts[int(no_data_value)])
+        counts[int(no_data_value)] = 0
+
+    return counts, no_data_count
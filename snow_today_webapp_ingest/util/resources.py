@@ -0,0 +1,237 @@
+"""Discover and measure how much CPU and memory this process may use."""
+
+import os
+import time
+from collections.abc import Callable, Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from multiprocessing.context import BaseContext
+from multiprocessing.queues import SimpleQueue
+from pathlib import Path
+from typing import ParamSpec, TypeVar
+
+from loguru import logger
+
+_CGROUP_MEMORY_MAX = Path("/sys/fs/cgroup/memory.max")
+_CGROUP_MEMORY_CURRENT = Path("/sys/fs/cgroup/memory.current")
+_CGROUP_MEMORY_STAT = Path("/sys/fs/cgroup/memory.stat")
+_MEMINFO = Path("/proc/meminfo")
+_PROC_STATUS = Path("/proc/self/status")
+_PROC_CLEAR_REFS = Path("/proc/self/clear_refs")
+_PROC_PID_STATUS = "/proc/{pid}/status"
+
+# How often to check whether memory has been freed
+MEMORY_POLL_SECONDS = 1.0
+# How long to wait for other processes to free memory, when we have nothing running
+MEMORY_WAIT_IDLE_SECONDS = 300.0
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# In worker processes started with `init_job_process_worker`, where to report which
+# process runs each job
+_job_starts: SimpleQueue[tuple[int, int]] | None = None
+
+
+def available_cpus() -> int:
+    """Return the number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on MacOS
+        return os.cpu_count() or 1
+
+
+def available_memory_bytes() -> int | None:
+    """Return the memory available to this process, or None if unknown.
+
+    In a container with a memory limit, this is the smaller of the remaining limit and
+    the host's available memory.
+    """
+    candidates = [
+        m for m in (_meminfo_available(), _cgroup_available()) if m is not None
+    ]
+    return min(candidates, default=None)
+
+
+class JobProcesses:
+    """Which worker process runs each job, as reported by the workers.
+
+    Start workers with `init_job_process_worker(job_processes.starts, ...)`, and run
+    each job with `report_job_process`.
+    """
+
+    def __init__(self, context: BaseContext):
+        self.starts: SimpleQueue[tuple[int, int]] = context.SimpleQueue()
+        self._pids: dict[int, int] = {}
+
+    def rss_bytes(self, job_id: int) -> int | None:
+        """Return the memory used by the worker running `job_id`, or None if unknown."""
+        while not self.starts.empty():
+            started_job_id, started_pid = self.starts.get()
+            self._pids[started_job_id] = started_pid
+
+        pid = self._pids.get(job_id)
+        return None if pid is None else _process_rss_bytes(pid)
+
+
+def init_job_process_worker(
+    starts: SimpleQueue[tuple[int, int]],
+    initializer: Callable[P, None],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> None:
+    """Initialize a worker process whose jobs report to `JobProcesses.starts`."""
+    global _job_starts
+    _job_starts = starts
+    initializer(*args, **kwargs)
+
+
+def report_job_process(job_id: int, func: Callable[[], T]) -> T:
+    """Report that this worker process runs `job_id`, then call `func`."""
+    if _job_starts is not None:
+        _job_starts.put((job_id, os.getpid()))
+    return func()
+
+
+def wait_for_memory(
+    required_bytes: int,
+    *,
+    reserved: Mapping[Future, int],
+    max_running: int,
+    rss_bytes: Callable[[Future], int | None] = lambda job: None,
+) -> set[Future]:
+    """Wait until another job which needs `required_bytes` of memory may start.
+
+    `reserved` maps each running job to the memory it may use, and `rss_bytes` returns
+    the memory each running job's process uses now, if known. Memory a job has already
+    allocated is counted as used, so only the rest of its reservation is subtracted
+    from what's available.
+
+    Waits while `max_running` jobs are running, or while there isn't enough memory and
+    running jobs will free some when they finish. If nothing is running, waits up to
+    `MEMORY_WAIT_IDLE_SECONDS` for other processes to free memory, then gives up
+    waiting.
+
+    Returns the jobs which finished while waiting.
+    """
+    pending = set(reserved)
+    finished: set[Future] = set()
+    idle_since: float | None = None
+    while not _may_start(
+        required_bytes,
+        reserved_bytes=sum(
+            max(reserved[job] - (rss_bytes(job) or 0), 0) for job in pending
+        ),
+        running=len(pending),
+        max_running=max_running,
+    ):
+        if pending:
+            done, pending = wait(
+                pending,
+                timeout=MEMORY_POLL_SECONDS,
+                return_when=FIRST_COMPLETED,
+            )
+            finished |= done
+            continue
+
+        if idle_since is None:
+            idle_since = time.monotonic()
+            logger.warning(
+                f"Waiting for {required_bytes / 1024**2:.0f}MB of memory to be free"
+            )
+        elif time.monotonic() - idle_since > MEMORY_WAIT_IDLE_SECONDS:
+            logger.warning("Memory is still short; starting anyway.")
+            break
+        time.sleep(MEMORY_POLL_SECONDS)
+
+    return finished
+
+
+def _may_start(
+    required_bytes: int,
+    *,
+    reserved_bytes: int,
+    running: int,
+    max_running: int,
+) -> bool:
+    if running >= max_running:
+        return False
+    available = available_memory_bytes()
+    return available is None or available - reserved_bytes >= required_bytes
+
+
+def measure_peak_rss(
+    func: Callable[P, T],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> tuple[T, int | None]:
+    """Call `func`; return its result and this process's peak memory during the call.
+
+    The peak resident set size is only measurable on Linux; elsewhere it's None.
+    """
+    try:
+        # Reset the peak ("high water mark") to the current resident set size
+        _PROC_CLEAR_REFS.write_text("5")
+    except OSError:
+        return func(*args, **kwargs), None
+
+    result = func(*args, **kwargs)
+    for line in _PROC_STATUS.read_text().splitlines():
+        if line.startswith("VmHWM:"):
+            # e.g. "VmHWM:     12345 kB"
+            return result, int(line.split()[1]) * 1024
+    return result, None
+
+
+def _meminfo_available() -> int | None:
+    try:
+        meminfo = _MEMINFO.read_text()
+    except OSError:
+        return None
+
+    for line in meminfo.splitlines():
+        if line.startswith("MemAvailable:"):
+            # e.g. "MemAvailable:   12345678 kB"
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def _process_rss_bytes(pid: int) -> int | None:
+    try:
+        status = Path(_PROC_PID_STATUS.format(pid=pid)).read_text()
+    except OSError:
+        return None
+
+    for line in status.splitlines():
+        if line.startswith("VmRSS:"):
+            # e.g. "VmRSS:     12345 kB"
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def _cgroup_available() -> int | None:
+    try:
+        limit = _CGROUP_MEMORY_MAX.read_text().strip()
+        current = int(_CGROUP_MEMORY_CURRENT.read_text())
+    except (OSError, ValueError):
+        return None
+
+    if limit == "max":
+        return None
+    # The current usage includes the page cache. Inactive file pages are reclaimed
+    # before the limit is enforced, so they're available too.
+    return max(int(limit) - (current - _cgroup_inactive_file_bytes()), 0)
+
+
+def _cgroup_inactive_file_bytes() -> int:
+    try:
+        stat = _CGROUP_MEMORY_STAT.read_text()
+    except OSError:
+        return 0
+
+    for line in stat.splitlines():
+        # e.g. "inactive_file 12345678"
+        key, _, value = line.partition(" ")
+        if key == "inactive_file":
+            return int(value)
+    return 0
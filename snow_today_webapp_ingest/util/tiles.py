@@ -0,0 +1,184 @@
+"""Render colorized Web Mercator (XYZ) map tiles with GDAL and NumPy.
+
+Rendering functions run in worker processes started with `init_gdal_worker`. Keep
+imports light.
+"""
+
+import math
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+
+TILE_SIZE = 256
+# Half the width of the Web Mercator (EPSG:3857) world, in meters
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+Bounds = tuple[float, float, float, float]
+TileFormat = Literal["PNG", "WEBP"]
+TileId = tuple[int, int, int]
+
+
+def tile_bounds(z: int, x: int, y: int) -> Bounds:
+    """Return (min x, min y, max x, max y) of an XYZ tile, in EPSG:3857 meters."""
+    tile_span = 2 * WEB_MERCATOR_EXTENT / 2**z
+    min_x = -WEB_MERCATOR_EXTENT + x * tile_span
+    max_y = WEB_MERCATOR_EXTENT - y * tile_span
+    return (min_x, max_y - tile_span, min_x + tile_span, max_y)
+
+
+def tiles_covering(bounds: Bounds, *, zoom: int) -> list[TileId]:
+    """List the tiles at `zoom` which intersect `bounds` (in EPSG:3857 meters)."""
+    tile_span = 2 * WEB_MERCATOR_EXTENT / 2**zoom
+    last = 2**zoom - 1
+
+    def _tile_index(meters_from_edge: float) -> int:
+        return min(max(int(meters_from_edge // tile_span), 0), last)
+
+    min_x, min_y, max_x, max_y = bounds
+    # Shrink slightly, so bounds on a tile edge don't include the next tile
+    epsilon = tile_span * 1e-9
+    xs = range(
+        _tile_index(min_x + WEB_MERCATOR_EXTENT + epsilon),
+        _tile_index(max_x + WEB_MERCATOR_EXTENT - epsilon) + 1,
+    )
+    ys = range(
+        _tile_index(WEB_MERCATOR_EXTENT - max_y + epsilon),
+        _tile_index(WEB_MERCATOR_EXTENT - min_y - epsilon) + 1,
+    )
+    return [(zoom, x, y) for y in ys for x in xs]
+
+
+def native_zoom(resolution_meters: float) -> int:
+    """Return the lowest zoom level with pixels as fine as `resolution_meters`."""
+    zoom_0_resolution = 2 * WEB_MERCATOR_EXTENT / TILE_SIZE
+    return max(math.ceil(math.log2(zoom_0_resolution / resolution_meters)), 0)
+
+
+def web_mercator_extent(path: Path) -> tuple[Bounds, float]:
+    """Return the EPSG:3857 bounds and pixel size (meters) of the raster at `path`."""
+    from osgeo import gdal
+
+    warped = gdal.Warp("", str(path), format="VRT", dstSRS="EPSG:3857")
+    min_x, pixel_width, _, max_y, _, pixel_height = warped.GetGeoTransform()
+    max_x = min_x + pixel_width * warped.RasterXSize
+    min_y = max_y + pixel_height * warped.RasterYSize
+    return (min_x, min_y, max_x, max_y), pixel_width
+
+
+def colormap_lut(
+    *,
+    colors: list[tuple[int, ...]],
+    value_range: tuple[int, int],
+    n_values: int,
+    no_data_value: int | None,
+    transparent_zero: bool,
+) -> np.ndarray:
+    """Map every integer data value in `[0, n_values)` to an RGBA color.
+
+    Colors are interpolated linearly across `value_range`, like the legends, and
+    values outside it get the first or last color.
+    """
+    rgba = np.array([(*c, 255)[:4] for c in colors], dtype=np.float64)
+    stops = np.linspace(*value_range, num=len(colors))
+    values = np.arange(n_values)
+
+    lut = np.empty((n_values, 4), dtype=np.uint8)
+    for channel in range(4):
+        lut[:, channel] = np.interp(values, stops, rgba[:, channel]).round()
+
+    if transparent_zero:
+        lut[0] = 0
+    if no_data_value is not None:
+        lut[no_data_value] = 0
+    return lut
+
+
+@dataclass(frozen=True)
+class TileRenderJob:
+    """Render `tiles` of the raster at `source_path`."""
+
+    source_path: Path
+    tiles: list[TileId]
+    colors: list[tuple[int, ...]]
+    value_range: tuple[int, int]
+    no_data_value: int | None
+    transparent_zero: bool
+    file_format: TileFormat
+    resampling: str = "near"
+
+
+def render_tiles(job: TileRenderJob) -> list[tuple[TileId, bytes]]:
+    """Render and encode the tiles in `job`.
+
+    Tiles with no data are left out; clients show nothing where a tile is missing.
+    """
+    from osgeo import gdal
+
+    source = gdal.Open(str(job.source_path))
+    band = source.GetRasterBand(1)
+    if band.DataType not in (gdal.GDT_Byte, gdal.GDT_UInt16):
+        raise RuntimeError(f"Can't colorize {job.source_path}: not 8- or 16-bit")
+
+    n_values = 256 if band.DataType == gdal.GDT_Byte else 65536
+    if job.no_data_value is not None and not 0 <= job.no_data_value < n_values:
+        raise RuntimeError(
+            f"No-data value {job.no_data_value} is out of range for {job.source_path}"
+        )
+
+    lut = colormap_lut(
+        colors=job.colors,
+        value_range=job.value_range,
+        n_values=n_values,
+        no_data_value=job.no_data_value,
+        transparent_zero=job.transparent_zero,
+    )
+    # Where the source has no pixels, e.g. outside its bounds, warp to a transparent
+    # value.
+    fill_value = job.no_data_value if job.no_data_value is not None else 0
+
+    rendered: list[tuple[TileId, bytes]] = []
+    for z, x, y in job.tiles:
+        warped = gdal.Warp(
+            "",
+            source,
+            format="MEM",
+            dstSRS="EPSG:3857",
+            outputBounds=tile_bounds(z, x, y),
+            width=TILE_SIZE,
+            height=TILE_SIZE,
+            resampleAlg=job.resampling,
+            srcNodata=job.no_data_value,
+            dstNodata=fill_value,
+        )
+        rgba = lut[warped.GetRasterBand(1).ReadAsArray()]
+        if not rgba[:, :, 3].any():
+            continue
+
+        rendered.append(((z, x, y), encode_rgba(rgba, file_format=job.file_format)))
+
+    return rendered
+
+
+def encode_rgba(rgba: np.ndarray, *, file_format: TileFormat) -> bytes:
+    """Encode an (height, width, 4) uint8 array as an image."""
+    from osgeo import gdal
+
+    height, width, bands = rgba.shape
+    image = gdal.GetDriverByName("MEM").Create("", width, height, bands, gdal.GDT_Byte)
+    for band in range(bands):
+        image.GetRasterBand(band + 1).WriteArray(rgba[:, :, band])
+
+    options = ["LOSSLESS=TRUE"] if file_format == "WEBP" else ["ZLEVEL=9"]
+    path = f"/vsimem/{uuid.uuid4().hex}.{file_format.lower()}"
+    try:
+        gdal.GetDriverByName(file_format).CreateCopy(path, image, options=options)
+        f = gdal.VSIFOpenL(path, "rb")
+        try:
+            return gdal.VSIFReadL(1, gdal.VSIStatL(path).size, f)
+        finally:
+            gdal.VSIFCloseL(f)
+    finally:
+        gdal.Unlink(path)
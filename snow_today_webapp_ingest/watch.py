@@ -0,0 +1,223 @@
+"""Watch for incoming data, and ingest it as soon as it's complete.
+
+The supercomputer writes `incoming/{dataset-name}/TRIGGER` after it has finished
+sending input data. This module runs in a long-lived process, so the (slow) imports and
+schema generation needed for ingest are only done once, at start-up.
+
+Changes are detected with inotify where available. Because inotify doesn't see changes
+made on other hosts (e.g. over NFS), or in subdirectories, the incoming directories are
+also polled, and compared file by file before ingest starts.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Protocol
+
+from loguru import logger
+
+from snow_today_webapp_ingest.constants.paths import (
+    INCOMING_DIR,
+    INCOMING_SSP_DIR,
+    INCOMING_SWE_DIR,
+    INCOMING_TRIGGER_FILENAME,
+    INGEST_WATCH_STATE_FP,
+)
+from snow_today_webapp_ingest.types_.data_sources import DataSource
+
+WATCHED_INCOMING_DIRS: dict[DataSource, Path] = {
+    "snow-surface-properties": INCOMING_SSP_DIR,
+    "snow-water-equivalent": INCOMING_SWE_DIR,
+}
+
+# From <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_INOTIFY_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+)
+
+
+class _Waiter(Protocol):
+    def watch(self, path: Path) -> None: ...
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for a change. Return whether one was seen."""
+        ...
+
+
+class _InotifyWaiter:
+    def __init__(self) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def watch(self, path: Path) -> None:
+        # Adding a watch for an already-watched path is a no-op, so this is safe to call
+        # repeatedly, e.g. to start watching directories that have been created.
+        wd = self._libc.inotify_add_watch(self._fd, bytes(path), _INOTIFY_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"Failed to watch {path}: {os.strerror(errno)}")
+
+    def wait(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+
+        # We don't care what the events are, only that something happened.
+        try:
+            while os.read(self._fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+
+class _PollingWaiter:
+    def watch(self, path: Path) -> None:
+        pass
+
+    def wait(self, timeout: float) -> bool:
+        time.sleep(timeout)
+        return False
+
+
+def _make_waiter() -> _Waiter:
+    try:
+        return _InotifyWaiter()
+    except (AttributeError, OSError) as e:
+        logger.warning(f"inotify unavailable ({e}); falling back to polling only.")
+        return _PollingWaiter()
+
+
+def warm_up() -> None:
+    """Do the slow parts of ingest start-up ahead of time."""
+    from snow_today_webapp_ingest.data_classes import OUTPUT_DATA_CLASSES
+    from snow_today_webapp_ingest.ingest.validate_and_copy_json import json_validator
+
+    for data_class in OUTPUT_DATA_CLASSES.values():
+        ingest_func = data_class.ingest_task.ingest_func
+        ingest_func.resolve()
+        if (model := ingest_func.kwargs.get("model")) is not None:
+            json_validator(model)
+
+    logger.info("Warmed up; ready to ingest.")
+
+
+def watch_triggers(
+    sources: Iterable[DataSource],
+    *,
+    on_trigger: Callable[[DataSource], None],
+    poll_interval: float,
+    debounce: float,
+) -> None:
+    """Call `on_trigger` each time a data source's TRIGGER file is created or touched.
+
+    Once the TRIGGER file is seen, wait until there have been no changes to the incoming
+    directories for `debounce` seconds before calling `on_trigger`.
+
+    Runs forever. Errors raised by `on_trigger` are logged, not raised.
+    """
+    incoming_dirs = {source: WATCHED_INCOMING_DIRS[source] for source in sources}
+    processed = _read_state()
+    waiter = _make_waiter()
+
+    logger.info(f"Watching for TRIGGER files in: {sorted(incoming_dirs)}")
+    while True:
+        for path in (INCOMING_DIR, *incoming_dirs.values()):
+            if path.is_dir():
+                waiter.watch(path)
+
+        for source, incoming_dir in incoming_dirs.items():
+            trigger_fp = incoming_dir / INCOMING_TRIGGER_FILENAME
+            if _mtime_ns(trigger_fp) in (None, processed.get(source)):
+                continue
+
+            logger.info(f"Found '{trigger_fp}'; waiting for changes to settle...")
+            _wait_until_settled(incoming_dir, waiter=waiter, debounce=debounce)
+
+            # It may have been removed while we were waiting:
+            if (trigger_mtime_ns := _mtime_ns(trigger_fp)) is None:
+                continue
+
+            _call_and_log_errors(on_trigger, source)
+            processed[source] = trigger_mtime_ns
+            _write_state(processed)
+
+        waiter.wait(poll_interval)
+
+
+def _wait_until_settled(
+    incoming_dir: Path, *, waiter: _Waiter, debounce: float
+) -> None:
+    """Wait until nothing in `incoming_dir` has changed for `debounce` seconds."""
+    snapshot = _tree_snapshot(incoming_dir)
+    while True:
+        changed = waiter.wait(debounce)
+        latest = _tree_snapshot(incoming_dir)
+        if not changed and latest == snapshot:
+            return
+        snapshot = latest
+
+
+def _tree_snapshot(path: Path) -> tuple[int, int, int]:
+    """Summarize `path`'s tree as its number of entries, total size, and last change.
+
+    Change times (ctime) are used, not modification times: e.g. `rsync --times` sets a
+    file's mtime to the source's once it's written.
+    """
+    entries = total_bytes = last_change_ns = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in (*dirnames, *filenames):
+            try:
+                stat = os.lstat(os.path.join(dirpath, name))
+            except FileNotFoundError:
+                # Removed while walking
+                continue
+            entries += 1
+            total_bytes += stat.st_size
+            last_change_ns = max(last_change_ns, stat.st_ctime_ns)
+    return entries, total_bytes, last_change_ns
+
+
+def _call_and_log_errors(
+    on_trigger: Callable[[DataSource], None],
+    source: DataSource,
+) -> None:
+    """Call `on_trigger`, but don't let a failed ingest stop us from watching."""
+    try:
+        on_trigger(source)
+    except Exception:
+        logger.exception(f"Ingest of {source} failed; waiting for the next TRIGGER.")
+
+
+def _mtime_ns(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _read_state() -> dict[str, int]:
+    """Read the modification times of the last TRIGGER files we ingested."""
+    try:
+        return json.loads(INGEST_WATCH_STATE_FP.read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def _write_state(state: dict[str, int]) -> None:
+    INGEST_WATCH_STATE_FP.parent.mkdir(parents=True, exist_ok=True)
+    INGEST_WATCH_STATE_FP.write_text(json.dumps(state))
@@ -1,4 +1,8 @@
+import json
+import re
+import subprocess
 import sys
+from pathlib import Path
 
 from invoke import task
 from loguru import logger
@@ -7,6 +11,22 @@ from .util import REPO_ROOT_DIR, print_and_run
 
 sys.path.append(str(REPO_ROOT_DIR))
 
+# The CLI is run by cron and by hand; `--help` and argument errors should be instant.
+STARTUP_MODULE = 'snow_today_webapp_ingest.cli'
+STARTUP_BUDGET_MS = 250
+STARTUP_FORBIDDEN_MODULES = (
+    'jsonschema',
+    'matplotlib',
+    'numpy',
+    'osgeo',
+    'pydantic',
+)
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)$')
+# Example inputs for the alias check
+ALIAS_EXAMPLES_DIR = (
+    REPO_ROOT_DIR / 'doc/interfaces/incoming_snow_surface_properties/example_data'
+)
+
 
 @task(aliases=('mypy',))
 def typecheck(ctx):
@@ -17,7 +37,151 @@ def typecheck(ctx):
     logger.success('🦆 Type checking passed.')
 
 
-@task(default=True, pre=[typecheck])
+@task(pre=[typecheck])
 def static(ctx):
     """Run all static analysis tasks."""
     logger.success("🎉🎉🎉 All static analysis passed! 🎉🎉🎉")
+
+
+@task
+def startup(ctx, budget_ms=STARTUP_BUDGET_MS, runs=5):
+    """Check that importing the CLI is fast and doesn't import heavy libraries.
+
+    The fastest of several fresh interpreters is used, to reduce noise.
+    """
+    timings = [_import_time(STARTUP_MODULE) for _ in range(int(runs))]
+    cumulative_ms, imported = min(timings, key=lambda t: t[0])
+    print(
+        f'Importing {STARTUP_MODULE} took {cumulative_ms:.0f}ms (budget {budget_ms}ms)'
+    )
+
+    forbidden = sorted(
+        m for m in imported if m.split('.')[0] in STARTUP_FORBIDDEN_MODULES
+    )
+    if forbidden:
+        raise RuntimeError(f'{STARTUP_MODULE} imports heavy modules: {forbidden[:10]}')
+    if cumulative_ms > float(budget_ms):
+        raise RuntimeError(f'{STARTUP_MODULE} import exceeds budget of {budget_ms}ms')
+
+    logger.success('⏱️ Start-up budget passed.')
+
+
+@task
+def aliases(ctx):
+    """Check that JSON inputs are rejected if they use field names instead of aliases.
+
+    Our models accept either in Python, but inputs must match the JSON schema, which
+    only has aliases. Each example is validated as-is, then with one camelCase key
+    renamed to snake_case.
+    """
+    from pydantic.alias_generators import to_snake
+
+    from snow_today_webapp_ingest.constants.paths import (
+        REPO_STATIC_COLORMAPS_INDEX_FP,
+        REPO_STATIC_SSP_VARIABLES_INDEX_FP,
+        REPO_STATIC_SWE_VARIABLES_INDEX_FP,
+    )
+    from snow_today_webapp_ingest.data_classes import (
+        OUTPUT_DATA_CLASSES,
+        OutputDataClassName,
+    )
+    from snow_today_webapp_ingest.ingest.validate_and_copy_json import (
+        json_schema,
+        json_validator,
+    )
+
+    # An example input for each data class validated by Pydantic
+    examples: dict[OutputDataClassName, Path] = {
+        'colormapsIndex': REPO_STATIC_COLORMAPS_INDEX_FP,
+        'sspVariablesIndex': REPO_STATIC_SSP_VARIABLES_INDEX_FP,
+        'sweVariablesIndex': REPO_STATIC_SWE_VARIABLES_INDEX_FP,
+        'superRegionsIndex': ALIAS_EXAMPLES_DIR / 'regions/root.json',
+        'subRegionsIndex': ALIAS_EXAMPLES_DIR / 'regions/26000.json',
+        'subRegionCollectionsIndex': ALIAS_EXAMPLES_DIR / 'regions/collections.json',
+        'plotsJson': ALIAS_EXAMPLES_DIR / 'plots/11726_40.json',
+    }
+    for data_class_name, example_fp in examples.items():
+        data_class = OUTPUT_DATA_CLASSES[data_class_name]
+        model = data_class.ingest_task.ingest_func.kwargs['model']
+        validate = json_validator(model)
+        document = json.loads(example_fp.read_bytes())
+        validate(json.dumps(document))
+
+        key = _snake_case_first_camel_key(
+            document,
+            aliases=_property_names(json_schema(model)),
+            to_snake=to_snake,
+        )
+        if key is None:
+            print(f'{data_class_name}: no camelCase field names to check')
+            continue
+        try:
+            validate(json.dumps(document))
+        except ValueError:
+            print(f'{data_class_name}: rejected snake_case key {key!r}')
+        else:
+            raise RuntimeError(
+                f'{data_class_name}: accepted snake_case key {key!r} in {example_fp}'
+            )
+
+    logger.success('🐫 Alias check passed.')
+
+
+@task(default=True, pre=[static, startup, aliases], aliases=('all',))
+def all_checks(ctx):
+    """Run all checks."""
+    logger.success("🎉🎉🎉 All checks passed! 🎉🎉🎉")
+
+
+def _property_names(schema) -> set[str]:
+    """Collect the property names of every object in a JSON schema."""
+    names: set[str] = set()
+    pending = [schema]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, dict):
+            names |= set(node.get('properties', {}))
+            pending.extend(node.values())
+    return names
+
+
+def _snake_case_first_camel_key(document, *, aliases, to_snake) -> str | None:
+    """Rename the first camelCase field in `document` to snake_case, in place."""
+    pending = [document]
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, dict):
+            for key in list(node):
+                if key in aliases and to_snake(key) != key:
+                    node[to_snake(key)] = node.pop(key)
+                    return to_snake(key)
+            pending.extend(node.values())
+    return None
+
+
+def _import_time(module: str) -> tuple[float, set[str]]:
+    """Import `module` in a fresh interpreter; return cumulative ms and modules seen."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        check=True,
+        cwd=REPO_ROOT_DIR,
+        text=True,
+    )
+
+    cumulative_us = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not (match := _IMPORTTIME_LINE.match(line)):
+            continue
+        imported.add(match.group(3))
+        if match.group(3) == module and not match.group(2):
+            cumulative_us = int(match.group(1))
+
+    if cumulative_us is None:
+        raise RuntimeError(f'No import time reported for {module}')
+    return cumulative_us / 1000, imported